@@ -0,0 +1,292 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+from fastapi import HTTPException
+
+from metrics import record, record_admission
+
+# Concurrent work allowed per pipeline stage, across all requests. A
+# transcript slot covers one provider race (cache misses only); an LLM slot
+# covers one summary, including its map step.
+ADMISSION_TRANSCRIPT_CONCURRENCY = int(os.environ.get(
+    "ADMISSION_TRANSCRIPT_CONCURRENCY", os.environ.get("TRANSCRIPT_WORKERS", "8")))
+ADMISSION_LLM_CONCURRENCY = int(os.environ.get("ADMISSION_LLM_CONCURRENCY", "8"))
+# Requests allowed to wait for a slot per stage; beyond that they get a 429.
+ADMISSION_QUEUE_SIZE = int(os.environ.get("ADMISSION_QUEUE_SIZE", "32"))
+# Seconds an API request may spend in the pipeline before it is not worth
+# starting any more work for it. Work admitted with a longer budget (e.g. a
+# long-context summary route's timeout) gets that budget instead.
+ADMISSION_DEADLINE = float(os.environ.get("ADMISSION_DEADLINE", "30"))
+# Comma-separated API keys (X-API-Key header) served in the premium lane.
+PREMIUM_API_KEYS = frozenset(
+    key.strip() for key in os.environ.get("PREMIUM_API_KEYS", "").split(",") if key.strip()
+)
+
+# Lanes, served in this order. Background work (jobs, batches) is not
+# bounded by the queue size or a deadline; it just waits its turn.
+PREMIUM, CACHE_HIT, DEFAULT, BACKGROUND = 0, 1, 2, 3
+
+_lane: ContextVar[int] = ContextVar("admission_lane", default=BACKGROUND)
+_deadline: ContextVar[float | None] = ContextVar("admission_deadline", default=None)
+
+
+class Overloaded(HTTPException):
+    """A request shed by admission control: 429 with a Retry-After hint."""
+
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(status_code=429, detail=detail,
+                         headers={"Retry-After": str(retry_after)})
+        self.retry_after = retry_after
+
+
+def start_request(api_key: str | None) -> None:
+    """Put the current (API) request in its lane and start its deadline."""
+    _lane.set(PREMIUM if api_key and api_key in PREMIUM_API_KEYS else DEFAULT)
+    _deadline.set(time.monotonic() + ADMISSION_DEADLINE)
+
+
+def run_in_background_lane() -> None:
+    _lane.set(BACKGROUND)
+    _deadline.set(None)
+
+
+def mark_cache_hit() -> None:
+    """Promote a default-lane request whose transcript came from the cache."""
+    if _lane.get() == DEFAULT:
+        _lane.set(CACHE_HIT)
+
+
+class _Waiter:
+    __slots__ = ("lane", "seq", "deadline", "kind", "future")
+
+    def __init__(self, lane: int, seq: int, deadline: float | None, kind: str,
+                 future: asyncio.Future):
+        self.lane = lane
+        self.seq = seq
+        self.deadline = deadline
+        self.kind = kind
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.lane, self.seq) < (other.lane, other.seq)
+
+
+class StageGate:
+    """Bounded concurrency for one pipeline stage with a priority wait queue.
+
+    Waiters are served by lane, then arrival. A request is turned away with
+    ``Overloaded`` instead of queued when the queue is full (unless it can
+    push out a lower-lane waiter), when its deadline leaves less time than
+    the expected wait plus its typical run time, or when it is still queued
+    once that point passes. Run times are EWMAs of slot hold times per
+    ``kind`` of work (e.g. the summary route), so one slow long-video summary
+    does not make every short one look too slow to admit; the expected wait
+    comes from the run times of the work currently holding the slots.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int = ADMISSION_QUEUE_SIZE):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.active = 0
+        self._heap: list[_Waiter] = []  # may hold settled waiters; skipped on pop
+        self._waiting = 0  # live waiters
+        self._queued = 0  # live waiters in lanes bounded by queue_size
+        self._seq = itertools.count()
+        self.service_time: float | None = None  # across kinds; for Retry-After
+        self.kind_times: dict[str, float] = {}
+        self._holding: dict[str, int] = {}  # active slots per kind
+        self.outcomes = {"admitted": 0, "queued": 0, "rejected": 0, "dropped": 0}
+
+    def _run_time(self, kind: str) -> float:
+        return self.kind_times.get(kind, self.service_time or 0.0)
+
+    def _expected_wait(self, ahead: int) -> float:
+        """Seconds until a slot frees up for a request with ``ahead`` waiters in front."""
+        if self.service_time is None or (self.active < self.limit and not ahead):
+            return 0.0
+        held = [(self._run_time(kind), n) for kind, n in self._holding.items() if n > 0]
+        turnover = (sum(t * n for t, n in held) / sum(n for _, n in held)
+                    if held else self.service_time)
+        return (ahead + 1) * turnover / self.limit
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._expected_wait(self._queued)))
+
+    def _hold(self, kind: str) -> None:
+        self.active += 1
+        self._holding[kind] = self._holding.get(kind, 0) + 1
+
+    def _shed(self, outcome: str, detail: str) -> Overloaded:
+        self.outcomes[outcome] += 1
+        record_admission(self.name, outcome)
+        return Overloaded(detail, self.retry_after())
+
+    def _admitted(self) -> None:
+        self.outcomes["admitted"] += 1
+        record_admission(self.name, "admitted")
+
+    def _settle(self, waiter: _Waiter) -> None:
+        # whoever takes a waiter out of the queue settles its future right after
+        self._waiting -= 1
+        if waiter.lane != BACKGROUND:
+            self._queued -= 1
+
+    def _can_queue(self, lane: int) -> bool:
+        if lane == BACKGROUND or self._queued < self.queue_size:
+            return True
+        return any(not w.future.done() and BACKGROUND > w.lane > lane for w in self._heap)
+
+    def check(self) -> None:
+        """Raise ``Overloaded`` now if this request could not even be queued."""
+        if self.active >= self.limit and not self._can_queue(_lane.get()):
+            raise self._shed("rejected", f"Server busy ({self.name}), retry later")
+
+    def _make_room(self, lane: int) -> bool:
+        """Shed the newest waiter of the lowest lane below ``lane``, if any."""
+        victim = None
+        for waiter in self._heap:
+            if waiter.future.done() or waiter.lane == BACKGROUND or waiter.lane <= lane:
+                continue
+            if victim is None or (waiter.lane, waiter.seq) > (victim.lane, victim.seq):
+                victim = waiter
+        if victim is None:
+            return False
+        self._settle(victim)
+        victim.future.set_exception(self._shed("rejected", f"Server busy ({self.name}), retry later"))
+        return True
+
+    def _release(self, kind: str, held: float | None) -> None:
+        """Free a slot; ``held`` (seconds) updates the run times unless None (slot never used)."""
+        if held is not None:
+            self.service_time = held if self.service_time is None else 0.8 * self.service_time + 0.2 * held
+            previous = self.kind_times.get(kind)
+            self.kind_times[kind] = held if previous is None else 0.8 * previous + 0.2 * held
+        self.active -= 1
+        self._holding[kind] -= 1
+        now = time.monotonic()
+        while self._heap and self.active < self.limit:
+            waiter = heapq.heappop(self._heap)
+            if waiter.future.done():
+                continue
+            self._settle(waiter)
+            if waiter.deadline is not None and now + self._run_time(waiter.kind) > waiter.deadline:
+                # would not finish in time; give the slot to someone who can
+                waiter.future.set_exception(self._shed("dropped", f"Server busy ({self.name}), retry later"))
+                continue
+            self._hold(waiter.kind)
+            waiter.future.set_result(None)
+
+    async def _acquire(self, kind: str, budget: float | None) -> None:
+        lane, deadline = _lane.get(), _deadline.get()
+        if deadline is not None and budget is not None and budget > ADMISSION_DEADLINE:
+            deadline += budget - ADMISSION_DEADLINE
+        if self.active < self.limit and not self._waiting:
+            self._hold(kind)
+            self._admitted()
+            return
+
+        if lane != BACKGROUND:
+            ahead = sum(1 for w in self._heap if not w.future.done() and w.lane <= lane)
+            finish = time.monotonic() + self._expected_wait(ahead) + self._run_time(kind)
+            if deadline is not None and finish > deadline:
+                raise self._shed("rejected", f"Server busy ({self.name}), retry later")
+            if self._queued >= self.queue_size and not self._make_room(lane):
+                raise self._shed("rejected", f"Server busy ({self.name}), retry later")
+            self._queued += 1
+        self._waiting += 1
+
+        waiter = _Waiter(lane, next(self._seq), deadline, kind,
+                         asyncio.get_running_loop().create_future())
+        heapq.heappush(self._heap, waiter)
+        self.outcomes["queued"] += 1
+        record_admission(self.name, "queued")
+        timeout = None
+        if deadline is not None:
+            timeout = max(deadline - time.monotonic() - self._run_time(kind), 0.0)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                self._settle(waiter)
+                waiter.future.cancel()
+                raise self._shed("dropped", f"Timed out waiting for the {self.name} stage")
+            if waiter.future.exception() is not None:
+                raise waiter.future.exception()
+            # the slot arrived just as the wait ran out
+        except asyncio.CancelledError:
+            if not waiter.future.done():
+                self._settle(waiter)
+                waiter.future.cancel()
+            elif waiter.future.exception() is None:
+                self._release(kind, None)  # handed a slot nobody will use
+            raise
+        finally:
+            record("queue", time.perf_counter() - started, provider=self.name)
+        self._admitted()
+
+    @asynccontextmanager
+    async def admit(self, kind: str | None = None, budget: float | None = None):
+        """Hold a slot for one piece of work.
+
+        ``kind`` groups work with similar run times (default: the stage);
+        ``budget`` is how long the work may legitimately take, extending the
+        request's deadline for this stage when it is longer.
+        """
+        kind = kind or self.name
+        await self._acquire(kind, budget)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(kind, time.monotonic() - started)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self._waiting,
+            "queue_size": self.queue_size,
+            "service_time": None if self.service_time is None else round(self.service_time, 3),
+            "service_time_by_kind": {kind: round(t, 3) for kind, t in self.kind_times.items()},
+            **self.outcomes,
+        }
+
+
+transcript_gate = StageGate("transcript", ADMISSION_TRANSCRIPT_CONCURRENCY)
+llm_gate = StageGate("llm", ADMISSION_LLM_CONCURRENCY)
+
+
+def check_capacity() -> None:
+    """Shed a request at the door when the LLM stage is already full.
+
+    Saves fetching a transcript for a request that would be rejected at the
+    LLM stage anyway. The transcript stage is checked by load_transcript,
+    and only on a cache miss: cached transcripts never need its slots.
+    """
+    llm_gate.check()
+
+
+def admission_stats() -> dict:
+    return {gate.name: gate.snapshot() for gate in (transcript_gate, llm_gate)}
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that assigns each HTTP request its lane and deadline."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            headers = dict(scope.get("headers") or [])
+            api_key = headers.get(b"x-api-key")
+            start_request(api_key.decode("latin-1") if api_key else None)
+        await self.app(scope, receive, send)
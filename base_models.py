@@ -1,5 +1,30 @@
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, Field, model_validator
 
 
 class VideoURLRequest(BaseModel):
-    video_url: str
\ No newline at end of file
+    video_url: str
+    # Optional time range in seconds; only the captions inside it are summarized.
+    start: float | None = Field(default=None, ge=0)
+    end: float | None = Field(default=None, gt=0)
+    # Summarize each chapter (YouTube's, or fixed windows) separately.
+    chapters: bool = False
+    # Granularity served from the cached summary tree; None keeps the classic summary.
+    detail: Literal["brief", "paragraph", "detailed"] | None = None
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.start is not None and self.end is not None and self.end <= self.start:
+            raise ValueError("end must be after start")
+        return self
+
+
+class BatchSummaryRequest(BaseModel):
+    video_urls: list[str] = []
+    playlist_url: str | None = None
+
+
+class JobRequest(BaseModel):
+    video_url: str
+    webhook_url: str | None = None
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import os
+
+from fastapi import HTTPException
+
+from admission import run_in_background_lane
+from get_transcript_variations import extract_video_id
+from pipeline import load_transcript
+from transcript_executor import TRANSCRIPT_WORKERS, run_in_transcript_pool
+from video_processing import SUMMARY_CONCURRENCY, summarize_video
+
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "500"))
+# Per-stage limits for one batch. Each item gives up its transcript slot
+# before waiting for an LLM slot, so both stages stay busy at the same time.
+BATCH_TRANSCRIPT_CONCURRENCY = int(
+    os.environ.get("BATCH_TRANSCRIPT_CONCURRENCY", str(TRANSCRIPT_WORKERS))
+)
+BATCH_SUMMARY_CONCURRENCY = int(
+    os.environ.get("BATCH_SUMMARY_CONCURRENCY", str(SUMMARY_CONCURRENCY))
+)
+
+
+def _flat_playlist(playlist_url: str) -> list[str]:
+    import yt_dlp
+
+    ydl_opts = {
+        "quiet": True,
+        "no_warnings": True,
+        "extract_flat": "in_playlist",
+        "playlistend": BATCH_MAX_ITEMS,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(playlist_url, download=False)
+    urls = []
+    for entry in info.get("entries") or []:
+        if entry and entry.get("id"):
+            urls.append(f"https://www.youtube.com/watch?v={entry['id']}")
+    return urls
+
+
+async def expand_playlist(playlist_url: str) -> list[str]:
+    """Video URLs of a playlist, from yt-dlp's flat (metadata-only) extraction."""
+    try:
+        return await run_in_transcript_pool(_flat_playlist, playlist_url)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out expanding the playlist.")
+    except Exception as e:
+        print(f"[batch] playlist expansion failed: {e!r}")
+        raise HTTPException(status_code=400, detail="Could not read the playlist.")
+
+
+async def _summarize_item(index: int, video_url: str,
+                          transcript_slots: asyncio.Semaphore,
+                          summary_slots: asyncio.Semaphore) -> dict:
+    item = {"index": index, "video_url": video_url}
+    video_id = extract_video_id(video_url)
+    item["video_id"] = video_id
+    try:
+        if not video_id:
+            raise HTTPException(status_code=400, detail="Invalid YouTube URL")
+        async with transcript_slots:
+            transcript = await load_transcript(video_id, video_url)
+        if not transcript:
+            raise HTTPException(status_code=404, detail="No auto‑CC found")
+        async with summary_slots:
+            # SummaryFailed (a 502 HTTPException) when the LLM call fails
+            summary = await summarize_video(transcript.text)
+        if not summary:
+            raise HTTPException(status_code=502, detail="Failed to get the summary.")
+    except HTTPException as e:
+        item.update(status="error", status_code=e.status_code, error=e.detail)
+        return item
+    except Exception as e:
+        print(f"[batch] item {index} ({video_url}) failed: {e!r}")
+        item.update(status="error", status_code=500, error=str(e) or repr(e))
+        return item
+    item.update(status="ok", summary=summary)
+    return item
+
+
+async def run_batch(video_urls: list[str]):
+    """Summarize many videos, yielding one NDJSON line per item as it finishes.
+
+    Failures are reported on the item's own line; the stream ends with a
+    ``{"done": true, ...}`` totals line. Closing the generator cancels any
+    items still running. Items wait for admission slots behind API requests
+    instead of being shed.
+    """
+    run_in_background_lane()
+    transcript_slots = asyncio.Semaphore(BATCH_TRANSCRIPT_CONCURRENCY)
+    summary_slots = asyncio.Semaphore(BATCH_SUMMARY_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(_summarize_item(i, url, transcript_slots, summary_slots))
+        for i, url in enumerate(video_urls)
+    ]
+    ok = failed = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            if item["status"] == "ok":
+                ok += 1
+            else:
+                failed += 1
+            yield json.dumps(item) + "\n"
+        yield json.dumps({"done": True, "total": len(tasks), "ok": ok, "failed": failed}) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,112 @@
+"""Micro-benchmark for caption_parser against the parsers it replaced.
+
+Builds synthetic json3, VTT (with YouTube-style rolling auto-caption lines)
+and timedtext XML payloads of a given length and times full-payload and
+chunked (streaming) parsing.
+
+    python benchmarks/bench_caption_parser.py --hours 3 --repeat 5
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+from urllib.parse import unquote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from caption_parser import CaptionParser, captions_to_text  # noqa: E402
+from synthetic import CUE_SECONDS, make_json3, make_vtt, make_xml  # noqa: E402
+
+
+# -- the implementations caption_parser replaced ------------------------------
+
+
+def legacy_json3_to_text(payload: str) -> str:
+    data = json.loads(payload)
+    parts = []
+    for ev in data.get("events", []):
+        segs = ev.get("segs")
+        if not segs:
+            continue
+        tokens = [seg.get("utf8", "") for seg in segs if seg.get("utf8", "") != "\n"]
+        if tokens:
+            parts.append("".join(tokens))
+    text = " ".join(parts)
+    text = re.sub(r"\s+([.,!?;:])", r"\1", text)
+    return re.sub(r"\s{2,}", " ", text).strip()
+
+
+def legacy_vtt_to_text(vtt: str) -> str:
+    lines = []
+    for line in vtt.splitlines():
+        s = line.strip()
+        if not s or s.startswith("WEBVTT") or "-->" in s or s.isdigit():
+            continue
+        s = (s.replace("<c>", "").replace("</c>", "")
+               .replace("<b>", "").replace("</b>", "")
+               .replace("<i>", "").replace("</i>", ""))
+        lines.append(s)
+    return re.sub(r"\s+([.,!?;:])", r"\1", " ".join(lines)).strip()
+
+
+def legacy_parse_xml(xml_content: str) -> str:
+    xml_content = xml_content.replace('&', '&amp;').replace('&amp;amp;', '&amp;')
+    root = ET.fromstring(xml_content)
+    transcript_text = ""
+    for text_elem in root.findall('.//text') or root.findall('.//p'):
+        if text_elem.text:
+            text = unquote(text_elem.text)
+            text = text.replace('&amp;', '&').replace('&lt;', '<').replace('&gt;', '>')
+            text = text.replace('\n', ' ').strip()
+            if text:
+                transcript_text += text + " "
+    return transcript_text.strip()
+
+
+def streamed(payload: str, chunk_size: int = 16384) -> str:
+    parser = CaptionParser()
+    segments = []
+    for i in range(0, len(payload), chunk_size):
+        segments.extend(parser.feed(payload[i:i + chunk_size]))
+    segments.extend(parser.close())
+    return " ".join(s.text for s in segments)
+
+
+def best_of(fn, payload: str, repeat: int) -> tuple[float, int]:
+    timings = []
+    out = ""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = fn(payload)
+        timings.append(time.perf_counter() - started)
+    return min(timings), len(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=3.0, help="synthetic video length")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    n_cues = int(args.hours * 3600 / CUE_SECONDS)
+    payloads = {"json3": make_json3(n_cues), "vtt": make_vtt(n_cues), "xml": make_xml(n_cues)}
+    legacy = {"json3": legacy_json3_to_text, "vtt": legacy_vtt_to_text, "xml": legacy_parse_xml}
+
+    print(f"{n_cues} cues ({args.hours}h), best of {args.repeat}")
+    print(f"{'format':<6} {'size':>9} {'impl':<16} {'seconds':>9} {'MB/s':>8} {'out chars':>10}")
+    for fmt, payload in payloads.items():
+        size_mb = len(payload) / 1e6
+        for name, fn in (("legacy", legacy[fmt]),
+                         ("caption_parser", captions_to_text),
+                         ("streamed 16KiB", streamed)):
+            seconds, out_len = best_of(fn, payload, args.repeat)
+            print(f"{fmt:<6} {size_mb:>8.1f}M {name:<16} {seconds:>9.4f} "
+                  f"{size_mb / seconds:>8.1f} {out_len:>10}")
+
+
+if __name__ == "__main__":
+    main()
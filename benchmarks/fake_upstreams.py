@@ -0,0 +1,190 @@
+"""Local stand-ins for YouTube timedtext, Invidious and Together AI.
+
+Serves caption payloads (json3, VTT or XML) built from the sample transcript
+and Together-compatible chat completions (plain and streamed) with
+configurable latency and error rates, so the service can be load-tested
+without touching the network.
+
+    python benchmarks/fake_upstreams.py --port 9100 --llm-latency 0.8 --llm-error-rate 0.02
+
+Point the app at it with:
+
+    TOGETHER_API_BASE=http://127.0.0.1:9100/v1
+    YOUTUBE_TIMEDTEXT_URL=http://127.0.0.1:9100/api/timedtext
+    INVIDIOUS_INSTANCES=http://127.0.0.1:9100
+    TRANSCRIPT_PROVIDERS=timedtext,invidious
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import MAKERS, cues_for_minutes  # noqa: E402
+
+MEDIA_TYPES = {"json3": "application/json", "vtt": "text/vtt", "xml": "text/xml"}
+
+config = {
+    "caption_format": "xml",
+    "transcript_minutes": 10.0,
+    "caption_latency": 0.05,
+    "caption_bandwidth": 0.0,
+    "llm_latency": 0.5,
+    "llm_prompt_latency": 0.0,
+    "llm_jitter": 0.2,
+    "llm_token_latency": 0.01,
+    "llm_error_rate": 0.0,
+    "llm_error_status": 429,
+    "llm_error_models": "",
+}
+counters: Counter = Counter()
+_payloads: dict[tuple[str, float], str] = {}
+
+app = FastAPI()
+
+
+def _payload(fmt: str) -> str:
+    key = (fmt, config["transcript_minutes"])
+    if key not in _payloads:
+        _payloads[key] = MAKERS[fmt](cues_for_minutes(config["transcript_minutes"]))
+    return _payloads[key]
+
+
+def _with_marker(payload: str, fmt: str, video_id: str) -> str:
+    """Prepend a cue naming the video so each video gets a distinct transcript."""
+    if fmt == "json3":
+        event = json.dumps({"tStartMs": 0, "dDurationMs": 100, "segs": [{"utf8": f"Video {video_id}."}]})
+        return payload.replace('"events": [', f'"events": [{event}, ', 1)
+    if fmt == "vtt":
+        cue = f"00:00:00.000 --> 00:00:00.100\nVideo {video_id}.\n\n"
+        return payload.replace("\n\n", "\n\n" + cue, 1)
+    return payload.replace("<transcript>", f'<transcript><text start="0" dur="0.1">Video {video_id}.</text>', 1)
+
+
+async def _captions(fmt: str, video_id: str) -> Response:
+    counters[f"captions_{fmt}"] += 1
+    await asyncio.sleep(config["caption_latency"])
+    body = _with_marker(_payload(fmt), fmt, video_id).encode("utf-8")
+    if not config["caption_bandwidth"]:
+        return Response(body, media_type=MEDIA_TYPES[fmt])
+
+    async def trickle():
+        # a slow link: the body arrives in pieces at caption_bandwidth bytes/s
+        piece = 16 * 1024
+        for i in range(0, len(body), piece):
+            await asyncio.sleep(piece / config["caption_bandwidth"])
+            yield body[i:i + piece]
+
+    return StreamingResponse(trickle(), media_type=MEDIA_TYPES[fmt])
+
+
+@app.get("/api/timedtext")
+async def timedtext(v: str, fmt: str = "srv3"):
+    # YouTube answers fmt=srv3 with XML; the configured format wins otherwise
+    return await _captions(config["caption_format"], v)
+
+
+@app.get("/api/v1/stats")
+async def invidious_stats():
+    counters["invidious_health"] += 1
+    return {"version": "fake", "software": {"name": "invidious"}}
+
+
+@app.get("/api/v1/videos/{video_id}")
+async def invidious_video(video_id: str):
+    counters["invidious_meta"] += 1
+    await asyncio.sleep(config["caption_latency"])
+    # real instances hand out instance-relative caption URLs
+    return {
+        "videoId": video_id,
+        "subtitles": [{
+            "lang": "en",
+            "kind": "asr",
+            "url": f"/captions/{video_id}.vtt",
+        }],
+    }
+
+
+@app.get("/captions/{video_id}.{fmt}")
+async def caption_file(video_id: str, fmt: str):
+    return await _captions(fmt if fmt in MAKERS else "vtt", video_id)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "fake")
+    counters["llm_requests"] += 1
+    counters[f"llm_requests:{model}"] += 1
+    latency = max(0.0, random.gauss(config["llm_latency"], config["llm_jitter"]))
+    # prefill: long prompts take longer before the first token
+    prompt_chars = sum(len(m.get("content") or "") for m in body.get("messages", []))
+    latency += config["llm_prompt_latency"] * prompt_chars / 4000
+    error_models = [m for m in config["llm_error_models"].split(",") if m]
+    if (not error_models or model in error_models) and random.random() < config["llm_error_rate"]:
+        counters["llm_errors"] += 1
+        await asyncio.sleep(latency / 4)
+        return JSONResponse({"error": {"message": "injected failure"}},
+                            status_code=config["llm_error_status"])
+
+    words = ("This is a synthetic summary of the video, produced by the fake "
+             "upstream so the benchmark measures the service, not the model.").split()
+    if not body.get("stream"):
+        await asyncio.sleep(latency + config["llm_token_latency"] * len(words))
+        return {
+            "id": f"fake-{time.time_ns()}",
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}}],
+        }
+
+    async def events():
+        await asyncio.sleep(latency)
+        for i, word in enumerate(words):
+            delta = {"choices": [{"index": 0, "delta": {"content": (" " if i else "") + word}}]}
+            yield f"data: {json.dumps(delta)}\n\n"
+            await asyncio.sleep(config["llm_token_latency"])
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+async def stats():
+    return dict(counters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake YouTube / Invidious / Together AI upstreams.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--caption-format", choices=sorted(MAKERS), default=config["caption_format"])
+    parser.add_argument("--transcript-minutes", type=float, default=config["transcript_minutes"])
+    parser.add_argument("--caption-latency", type=float, default=config["caption_latency"])
+    parser.add_argument("--caption-bandwidth", type=float, default=config["caption_bandwidth"],
+                        help="stream caption bodies at this many bytes/s (0 = all at once)")
+    parser.add_argument("--llm-latency", type=float, default=config["llm_latency"])
+    parser.add_argument("--llm-prompt-latency", type=float, default=config["llm_prompt_latency"],
+                        help="extra seconds per 1k prompt tokens")
+    parser.add_argument("--llm-jitter", type=float, default=config["llm_jitter"])
+    parser.add_argument("--llm-token-latency", type=float, default=config["llm_token_latency"])
+    parser.add_argument("--llm-error-rate", type=float, default=config["llm_error_rate"])
+    parser.add_argument("--llm-error-status", type=int, default=config["llm_error_status"])
+    parser.add_argument("--llm-error-models", default=config["llm_error_models"],
+                        help="comma-separated models the injected errors apply to (default: all)")
+    args = parser.parse_args()
+    for key in config:
+        config[key] = getattr(args, key)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Drive /summary at a fixed concurrency against local fake upstreams.
+
+Starts benchmarks/fake_upstreams.py and the app (uvicorn main:app) wired to
+it, fires ``--requests`` calls with ``--concurrency`` in flight, and reports
+p50/p95/p99 latency, requests/sec, status codes, per-stage timings (from the
+``Server-Timing`` response header, when the app sends one) and upstream call
+counts. Run it before and after a change to compare.
+
+    python benchmarks/load_test.py --requests 300 --concurrency 32 --distinct 50
+    python benchmarks/load_test.py --target http://127.0.0.1:8000   # app already running
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def parse_server_timing(header: str) -> dict[str, float]:
+    """``a;dur=1.2, b;desc="x";dur=3`` -> {"a": 1.2, "b": 3.0} (milliseconds)."""
+    stages = {}
+    for metric in filter(None, (m.strip() for m in header.split(","))):
+        name, *params = metric.split(";")
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                try:
+                    stages[name.strip()] = float(value)
+                except ValueError:
+                    pass
+    return stages
+
+
+async def wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_stack(args, workdir: str) -> tuple[list[subprocess.Popen], str, str]:
+    fake = f"http://127.0.0.1:{args.fake_port}"
+    app = f"http://127.0.0.1:{args.app_port}"
+    fake_cmd = [
+        sys.executable, os.path.join(BENCH_DIR, "fake_upstreams.py"),
+        "--port", str(args.fake_port),
+        "--caption-format", args.caption_format,
+        "--transcript-minutes", str(args.transcript_minutes),
+        "--caption-latency", str(args.caption_latency),
+        "--caption-bandwidth", str(args.caption_bandwidth),
+        "--llm-latency", str(args.llm_latency),
+        "--llm-prompt-latency", str(args.llm_prompt_latency),
+        "--llm-error-rate", str(args.llm_error_rate),
+        "--llm-error-models", args.llm_error_models,
+    ]
+    env = dict(os.environ)
+    for proxy in ("HTTP_PROXY", "HTTPS_PROXY", "http_proxy", "https_proxy"):
+        env.pop(proxy, None)
+    env.update({
+        "TOGETHER_AI_API_KEY": "benchmark",
+        "TOGETHER_API_BASE": f"{fake}/v1",
+        "YOUTUBE_TIMEDTEXT_URL": f"{fake}/api/timedtext",
+        "INVIDIOUS_INSTANCES": fake,
+        "TRANSCRIPT_PROVIDERS": args.providers,
+        "TRANSCRIPT_CACHE_DB": "" if args.no_disk_cache else os.path.join(workdir, "transcripts.sqlite3"),
+        "JOBS_DB": os.path.join(workdir, "jobs.sqlite3"),
+        # the fake upstreams never throttle; keep the app's limiters out of the way
+        "YOUTUBE_RATE": str(args.upstream_rate),
+        "YOUTUBE_BURST": str(args.upstream_rate),
+        "INVIDIOUS_RATE": str(args.upstream_rate),
+        "INVIDIOUS_BURST": str(args.upstream_rate),
+        "SUMMARY_PIPELINE": "1" if args.pipeline else "0",
+        "PYTHONUNBUFFERED": "1",
+    })
+    app_cmd = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(args.app_port),
+        "--workers", str(args.app_workers), "--log-level", "warning",
+    ]
+    log = open(os.path.join(workdir, "app.log"), "w")
+    procs = [
+        subprocess.Popen(fake_cmd, cwd=REPO_DIR),
+        subprocess.Popen(app_cmd, cwd=REPO_DIR, env=env, stdout=log, stderr=subprocess.STDOUT),
+    ]
+    return procs, fake, app
+
+
+async def run_load(args, app_url: str) -> dict:
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    stages: defaultdict[str, list[float]] = defaultdict(list)
+    counter = iter(range(args.requests))
+
+    def next_url() -> str | None:
+        i = next(counter, None)
+        if i is None:
+            return None
+        n = i % args.distinct if args.distinct else i
+        return f"https://www.youtube.com/watch?v=bench{n:06d}"
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout, limits=limits) as client:
+
+        async def worker():
+            while (video_url := next_url()) is not None:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(f"/{args.endpoint}", json={"video_url": video_url})
+                    await response.aread()
+                    statuses[response.status_code] += 1
+                    for name, ms in parse_server_timing(response.headers.get("server-timing", "")).items():
+                        stages[name].append(ms)
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 1) if latencies else None,
+            "p50": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99": round(percentile(latencies, 0.99) * 1000, 1),
+            "max": round(max(latencies) * 1000, 1) if latencies else None,
+        },
+        "status": {str(k): v for k, v in statuses.items()},
+        "stages_ms": {
+            name: {"p50": round(percentile(v, 0.5), 1), "p95": round(percentile(v, 0.95), 1),
+                   "count": len(v)}
+            for name, v in sorted(stages.items())
+        },
+    }
+
+
+def print_report(report: dict) -> None:
+    lat = report["latency_ms"]
+    print(f"requests   {report['requests']} @ concurrency {report['concurrency']}"
+          f" in {report['elapsed_s']}s -> {report['rps']} req/s")
+    print(f"latency ms p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}"
+          f"  mean {lat['mean']}  max {lat['max']}")
+    print(f"status     {report['status']}")
+    if report["stages_ms"]:
+        print("stages ms  (from Server-Timing)")
+        for name, s in report["stages_ms"].items():
+            print(f"  {name:<22} p50 {s['p50']:>9}  p95 {s['p95']:>9}  n={s['count']}")
+    if report.get("upstream"):
+        print(f"upstream   {report['upstream']}")
+
+
+async def main_async(args) -> dict:
+    procs: list[subprocess.Popen] = []
+    fake_url = None
+    with tempfile.TemporaryDirectory(prefix="vs-bench-") as workdir:
+        try:
+            if args.target:
+                app_url = args.target.rstrip("/")
+            else:
+                procs, fake_url, app_url = start_stack(args, workdir)
+                await wait_ready(f"{fake_url}/stats")
+            await wait_ready(f"{app_url}/ping")
+            if args.warmup:
+                warm = argparse.Namespace(**{**vars(args), "requests": args.warmup})
+                await run_load(warm, app_url)
+            before = {}
+            if fake_url:
+                before = httpx.get(f"{fake_url}/stats").json()
+            report = await run_load(args, app_url)
+            if fake_url:
+                after = httpx.get(f"{fake_url}/stats").json()
+                report["upstream"] = {k: after[k] - before.get(k, 0) for k in after}
+            return report
+        finally:
+            for proc in procs:
+                proc.terminate()
+            for proc in procs:
+                try:
+                    proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--distinct", type=int, default=0,
+                        help="distinct video IDs to cycle through (0 = every request unique)")
+    parser.add_argument("--endpoint", default="summary", choices=["summary", "summary/stream"])
+    parser.add_argument("--warmup", type=int, default=0, help="requests to send before measuring")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--target", help="benchmark an already running app instead of spawning one")
+    parser.add_argument("--app-port", type=int, default=9200)
+    parser.add_argument("--app-workers", type=int, default=1)
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument("--providers", default="timedtext,invidious",
+                        help="TRANSCRIPT_PROVIDERS for the spawned app")
+    parser.add_argument("--upstream-rate", type=float, default=1000.0,
+                        help="per-upstream request rate/burst allowed by the spawned app")
+    parser.add_argument("--no-disk-cache", action="store_true", help="disable the SQLite transcript tier")
+    parser.add_argument("--caption-format", default="xml", choices=["json3", "vtt", "xml"])
+    parser.add_argument("--transcript-minutes", type=float, default=10.0)
+    parser.add_argument("--caption-latency", type=float, default=0.05)
+    parser.add_argument("--caption-bandwidth", type=float, default=0.0,
+                        help="caption body bytes/s from the fake upstream (0 = all at once)")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-prompt-latency", type=float, default=0.0,
+                        help="extra fake LLM seconds per 1k prompt tokens")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-error-models", default="",
+                        help="comma-separated models the injected LLM errors apply to (default: all)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="run the app with SUMMARY_PIPELINE=1 (summarize while captions download)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
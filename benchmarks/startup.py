@@ -0,0 +1,167 @@
+"""Measure cold start: ``import main`` time and first-request latency.
+
+Imports the app in fresh interpreters (``--runs`` times) and reports the
+median wall time, the slowest top-level imports (from ``-X importtime``) and
+whether any of the lazily loaded provider libraries were pulled in anyway.
+Then starts the app against benchmarks/fake_upstreams.py and times process
+start -> first ``/ping``, then the first ``/summary`` and a second one for
+another video (same process, nothing cached).
+Exits non-zero when an import budget is exceeded, so it can gate CI:
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --max-import-ms 600 --json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from load_test import REPO_DIR, start_stack, wait_ready
+
+# Must not be imported by ``import main``; they load on first use or in the
+# background warm-up (transcript_providers.warm_providers).
+LAZY_MODULES = ("yt_dlp", "youtube_transcript_api", "requests", "transcript_text", "multiprocessing")
+
+_PROBE = (
+    "import sys, time, json\n"
+    "started = time.perf_counter()\n"
+    "import main\n"
+    "elapsed = time.perf_counter() - started\n"
+    "print(json.dumps({'ms': elapsed * 1000,"
+    " 'loaded': [m for m in %r if m in sys.modules]}))\n"
+) % (LAZY_MODULES,)
+
+
+def measure_import(runs: int) -> dict:
+    samples, loaded = [], set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _PROBE], cwd=REPO_DIR,
+                             capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(result["ms"])
+        loaded.update(result["loaded"])
+    return {
+        "runs": runs,
+        "median_ms": round(statistics.median(samples), 1),
+        "min_ms": round(min(samples), 1),
+        "max_ms": round(max(samples), 1),
+        "eagerly_loaded": sorted(loaded),
+    }
+
+
+def slowest_imports(top: int) -> list[dict]:
+    """Cumulative ``-X importtime`` cost of the heaviest modules ``main`` pulls in directly."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                         cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        # one leading space, then two per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        try:
+            rows.append((name.strip(), int(cumulative_us), depth))
+        except ValueError:
+            pass  # the header line
+    # depth 1 = imported by main itself (depth 0 is main)
+    direct = sorted((r for r in rows if r[2] == 1), key=lambda r: -r[1])
+    return [{"module": name, "ms": round(us / 1000, 1)} for name, us, _ in direct[:top]]
+
+
+async def measure_first_request(args, workdir: str) -> dict:
+    stack_args = argparse.Namespace(
+        fake_port=args.fake_port, app_port=args.app_port, app_workers=1,
+        caption_format="xml", transcript_minutes=10.0, caption_latency=0.05, caption_bandwidth=0.0,
+        llm_latency=args.llm_latency, llm_prompt_latency=0.0, llm_error_rate=0.0, llm_error_models="", providers=args.providers,
+        no_disk_cache=True, upstream_rate=1000.0, pipeline=False,
+    )
+    procs = []
+    try:
+        started = time.perf_counter()
+        procs, fake_url, app_url = start_stack(stack_args, workdir)
+        await wait_ready(f"{fake_url}/stats")
+        await wait_ready(f"{app_url}/ping", timeout=60)
+        ready = time.perf_counter() - started
+
+        timings = []
+        async with httpx.AsyncClient(base_url=app_url, timeout=120) as client:
+            for n in range(2):
+                video_url = f"https://www.youtube.com/watch?v=start{n:06d}"
+                t = time.perf_counter()
+                response = await client.post("/summary", json={"video_url": video_url})
+                timings.append((time.perf_counter() - t, response.status_code))
+        return {
+            # includes the fake upstream's own startup
+            "ready_ms": round(ready * 1000, 1),
+            "first_summary_ms": round(timings[0][0] * 1000, 1),
+            "second_summary_ms": round(timings[1][0] * 1000, 1),
+            "status": [status for _, status in timings],
+        }
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to time the import in")
+    parser.add_argument("--top", type=int, default=8, help="slowest direct imports to list")
+    parser.add_argument("--max-import-ms", type=float, default=0,
+                        help="fail if the median import time exceeds this (0 = no budget)")
+    parser.add_argument("--allow-eager", action="store_true",
+                        help="do not fail when a lazy provider library is imported at startup")
+    parser.add_argument("--skip-request", action="store_true", help="only measure the import")
+    parser.add_argument("--app-port", type=int, default=9201)
+    parser.add_argument("--fake-port", type=int, default=9101)
+    parser.add_argument("--providers", default="timedtext,invidious",
+                        help="TRANSCRIPT_PROVIDERS for the spawned app")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = {"import": measure_import(args.runs), "slowest_imports": slowest_imports(args.top)}
+    if not args.skip_request:
+        with tempfile.TemporaryDirectory(prefix="vs-startup-") as workdir:
+            report["first_request"] = asyncio.run(measure_first_request(args, workdir))
+
+    failures = []
+    if args.max_import_ms and report["import"]["median_ms"] > args.max_import_ms:
+        failures.append(f"import took {report['import']['median_ms']} ms"
+                        f" (budget {args.max_import_ms:g} ms)")
+    if report["import"]["eagerly_loaded"] and not args.allow_eager:
+        failures.append(f"imported at startup: {', '.join(report['import']['eagerly_loaded'])}")
+    report["failures"] = failures
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        imp = report["import"]
+        print(f"import main  median {imp['median_ms']} ms  (min {imp['min_ms']}, max {imp['max_ms']},"
+              f" {imp['runs']} runs)")
+        print("slowest direct imports")
+        for row in report["slowest_imports"]:
+            print(f"  {row['module']:<28} {row['ms']:>8} ms")
+        if "first_request" in report:
+            first = report["first_request"]
+            print(f"ready        {first['ready_ms']} ms after spawn")
+            print(f"/summary     first {first['first_summary_ms']} ms,"
+                  f" second {first['second_summary_ms']} ms  status {first['status']}")
+        for failure in failures:
+            print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Synthetic caption payloads built from the sample transcript.
+
+Used by the parser micro-benchmark and by the fake YouTube / Invidious
+upstreams, so both exercise the same json3, VTT and XML shapes YouTube serves.
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript_text import test_transcript  # noqa: E402
+
+CUE_SECONDS = 2.5
+
+
+def _words(n_cues: int, per_cue: int = 7):
+    words = test_transcript.split()
+    for i in range(n_cues):
+        start = (i * per_cue) % (len(words) - per_cue)
+        yield " ".join(words[start:start + per_cue])
+
+
+def _stamp(seconds: float) -> str:
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{int(h):02d}:{int(m):02d}:{s:06.3f}"
+
+
+def cues_for_minutes(minutes: float) -> int:
+    return max(1, int(minutes * 60 / CUE_SECONDS))
+
+
+def make_json3(n_cues: int) -> str:
+    events = []
+    for i, line in enumerate(_words(n_cues)):
+        t = int(i * CUE_SECONDS * 1000)
+        events.append({"tStartMs": t, "dDurationMs": int(CUE_SECONDS * 1000),
+                       "segs": [{"utf8": w + " "} for w in line.split()]})
+        events.append({"tStartMs": t + 2000, "aAppend": 1, "segs": [{"utf8": "\n"}]})
+    return json.dumps({"wireMagic": "pb3", "events": events})
+
+
+def make_vtt(n_cues: int) -> str:
+    """Auto-caption style VTT: inline word timings plus the rolling repeat cues."""
+    out = ["WEBVTT", "Kind: captions", "Language: en", ""]
+    previous = ""
+    for i, line in enumerate(_words(n_cues)):
+        start = i * CUE_SECONDS
+        words = line.split()
+        timed = words[0] + "".join(
+            f"<{_stamp(start + k * 0.3)}><c> {w}</c>" for k, w in enumerate(words[1:], 1)
+        )
+        out += [f"{_stamp(start)} --> {_stamp(start + CUE_SECONDS)} align:start position:0%",
+                previous or " ", timed, ""]
+        out += [f"{_stamp(start + CUE_SECONDS)} --> {_stamp(start + CUE_SECONDS + 0.01)}"
+                " align:start position:0%", line, " ", ""]
+        previous = line
+    return "\n".join(out)
+
+
+def make_xml(n_cues: int) -> str:
+    """timedtext XML, double-escaped the way YouTube serves it."""
+    cues = "".join(
+        f'<text start="{i * CUE_SECONDS:.2f}" dur="{CUE_SECONDS}">'
+        f'{line.replace("&", "&amp;amp;").replace("<", "&amp;lt;")}</text>'
+        for i, line in enumerate(_words(n_cues))
+    )
+    return f'<?xml version="1.0" encoding="utf-8" ?><transcript>{cues}</transcript>'
+
+
+MAKERS = {"json3": make_json3, "vtt": make_vtt, "xml": make_xml}
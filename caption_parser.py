@@ -0,0 +1,292 @@
+import html
+import json
+import re
+import xml.etree.ElementTree as ET
+from collections import deque
+from typing import NamedTuple
+
+_TAG = re.compile(r"<[^>]*>")
+_SPACE_BEFORE_PUNCT = re.compile(r"\s+([.,!?;:])")
+_MULTI_SPACE = re.compile(r"\s{2,}")
+_VTT_TIME = re.compile(r"(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{3})")
+
+# How many recently emitted lines a new line is compared against when
+# dropping the rolling repeats of YouTube auto-captions.
+_DEDUPE_WINDOW = 3
+
+
+class Segment(NamedTuple):
+    start: float     # seconds
+    duration: float  # seconds
+    text: str
+
+
+def sniff_format(head: str) -> str | None:
+    """Guess the caption format from the first bytes of a payload."""
+    s = head.lstrip("\ufeff \t\r\n")
+    if s.startswith("{"):
+        return "json3"
+    if s.startswith("WEBVTT"):
+        return "vtt"
+    if s.startswith("<"):
+        return "xml"
+    return None
+
+
+class _LineDeduper:
+    """Drop the rolling duplicate lines YouTube auto-captions repeat per cue."""
+
+    def __init__(self):
+        self.recent: deque[str] = deque(maxlen=_DEDUPE_WINDOW)
+
+    def __call__(self, line: str) -> str:
+        if not line or line in self.recent:
+            return ""
+        last = self.recent[-1] if self.recent else ""
+        self.recent.append(line)
+        if last and line.startswith(last + " "):
+            # the cue repeats the previous line and appends new words
+            return line[len(last) + 1:]
+        return line
+
+
+def _clean_lines(raw: str, dedupe: _LineDeduper) -> str:
+    if "\n" not in raw:
+        return dedupe(raw.strip())
+    return " ".join(filter(None, (dedupe(line.strip()) for line in raw.split("\n"))))
+
+
+class _Json3Parser:
+    """Streams ``events`` objects out of a json3 document with raw_decode."""
+
+    def __init__(self, dedupe: _LineDeduper):
+        self.dedupe = dedupe
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.in_events = False
+        self.done = False
+
+    def feed(self, data: str) -> list[Segment]:
+        self.buf += data
+        out: list[Segment] = []
+        if self.done:
+            return out
+        if not self.in_events:
+            i = self.buf.find('"events"', self.pos)
+            if i < 0:
+                return out
+            j = self.buf.find("[", i)
+            if j < 0:
+                return out
+            self.pos = j + 1
+            self.in_events = True
+
+        buf, n = self.buf, len(self.buf)
+        while True:
+            while self.pos < n and buf[self.pos] in " \t\r\n,":
+                self.pos += 1
+            if self.pos >= n:
+                break
+            if buf[self.pos] == "]":
+                self.done = True
+                break
+            try:
+                event, end = self.decoder.raw_decode(buf, self.pos)
+            except json.JSONDecodeError:
+                break  # incomplete object, wait for more data
+            self.pos = end
+            segment = self._segment(event)
+            if segment:
+                out.append(segment)
+
+        # keep the buffer from growing with already-consumed events
+        if self.pos > 65536:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        return out
+
+    def _segment(self, event: dict) -> Segment | None:
+        segs = event.get("segs")
+        if not segs:
+            return None
+        raw = "".join(seg.get("utf8", "") for seg in segs if seg.get("utf8") != "\n")
+        text = _clean_lines(raw, self.dedupe)
+        if not text:
+            return None
+        return Segment(event.get("tStartMs", 0) / 1000, event.get("dDurationMs", 0) / 1000, text)
+
+    def close(self) -> list[Segment]:
+        return []
+
+
+class _VttParser:
+    """Line-oriented WEBVTT parser; one Segment per cue."""
+
+    def __init__(self, dedupe: _LineDeduper):
+        self.dedupe = dedupe
+        self.partial = ""
+        self.cue_start: float | None = None
+        self.cue_duration = 0.0
+        self.cue_lines: list[str] = []
+
+    def feed(self, data: str) -> list[Segment]:
+        data = self.partial + data
+        lines = data.split("\n")
+        self.partial = lines.pop()
+        out: list[Segment] = []
+        for line in lines:
+            self._line(line.rstrip("\r"), out)
+        return out
+
+    def close(self) -> list[Segment]:
+        out: list[Segment] = []
+        if self.partial:
+            self._line(self.partial.rstrip("\r"), out)
+            self.partial = ""
+        self._flush(out)
+        return out
+
+    def _line(self, line: str, out: list[Segment]) -> None:
+        # only a truly empty line ends a cue; YouTube pads cues with " " lines
+        if "-->" in line:
+            self._flush(out)
+            start, _, end = line.partition("-->")
+            self.cue_start = _vtt_seconds(start)
+            end_seconds = _vtt_seconds(end.split()[0]) if end.split() else self.cue_start
+            self.cue_duration = round(max(end_seconds - self.cue_start, 0.0), 3)
+        elif not line:
+            self._flush(out)
+        elif self.cue_start is not None:
+            text = line
+            if "<" in text:
+                text = _TAG.sub("", text)
+            if "&" in text:
+                text = html.unescape(text)
+            text = text.strip()
+            if text:
+                self.cue_lines.append(text)
+        # anything outside a cue (WEBVTT header, Kind:, NOTE, STYLE, cue ids) is skipped
+
+    def _flush(self, out: list[Segment]) -> None:
+        if self.cue_start is not None:
+            text = " ".join(filter(None, (self.dedupe(l) for l in self.cue_lines)))
+            if text:
+                out.append(Segment(self.cue_start, self.cue_duration, text))
+        self.cue_start = None
+        self.cue_lines = []
+
+
+def _vtt_seconds(stamp: str) -> float:
+    m = _VTT_TIME.search(stamp)
+    if not m:
+        return 0.0
+    hours, minutes, seconds, millis = m.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+
+
+class _XmlParser:
+    """Handles timedtext (``<text start dur>``) and srv3 (``<p t d>``) with XMLPullParser."""
+
+    def __init__(self, dedupe: _LineDeduper):
+        self.dedupe = dedupe
+        self.parser = ET.XMLPullParser(events=("start", "end"))
+        self.stack: list[ET.Element] = []
+
+    def feed(self, data: str) -> list[Segment]:
+        self.parser.feed(data)
+        return self._drain()
+
+    def close(self) -> list[Segment]:
+        try:
+            self.parser.close()
+        except ET.ParseError:
+            pass  # a truncated tail should not throw away what we already have
+        return self._drain()
+
+    def _drain(self) -> list[Segment]:
+        out: list[Segment] = []
+        try:
+            for event, elem in self.parser.read_events():
+                if event == "start":
+                    self.stack.append(elem)
+                    continue
+                self.stack.pop()
+                if elem.tag == "text":
+                    start = float(elem.get("start", 0))
+                    duration = float(elem.get("dur", 0))
+                elif elem.tag == "p":
+                    start = int(elem.get("t", 0)) / 1000
+                    duration = int(elem.get("d", 0)) / 1000
+                else:
+                    continue
+                raw = "".join(elem.itertext())
+                if "&" in raw:
+                    # captions are often double-escaped (&amp;#39;), unescape once more
+                    raw = html.unescape(raw)
+                text = _clean_lines(raw, self.dedupe)
+                if text:
+                    out.append(Segment(start, duration, text))
+                # detach parsed cues so memory stays flat on long documents
+                if self.stack:
+                    self.stack[-1].clear()
+        except ET.ParseError as e:
+            print(f"[caption_parser] XML parsing error: {e}")
+        return out
+
+
+_PARSERS = {"json3": _Json3Parser, "vtt": _VttParser, "xml": _XmlParser}
+
+
+class CaptionParser:
+    """Incremental caption parser for json3, WEBVTT and srv3/timedtext XML.
+
+    ``feed`` accepts arbitrary text chunks (e.g. straight from a streaming
+    HTTP body) and returns the segments completed so far; ``close`` flushes
+    the rest. The format is sniffed from the first chunk unless given.
+    """
+
+    def __init__(self, fmt: str | None = None):
+        self.fmt = fmt
+        self._dedupe = _LineDeduper()
+        self._parser = _PARSERS[fmt](self._dedupe) if fmt else None
+        self._pending = ""
+
+    def feed(self, data: str) -> list[Segment]:
+        if self._parser is None:
+            self._pending += data
+            fmt = sniff_format(self._pending)
+            if fmt is None:
+                # "WEBVTT" may arrive split across chunks
+                if len(self._pending.strip()) >= len("WEBVTT"):
+                    raise ValueError("Unrecognised caption format")
+                return []
+            self.fmt = fmt
+            self._parser = _PARSERS[fmt](self._dedupe)
+            data, self._pending = self._pending, ""
+        return self._parser.feed(data)
+
+    def close(self) -> list[Segment]:
+        if self._parser is None:
+            if self._pending.strip():
+                raise ValueError("Unrecognised caption format")
+            return []
+        return self._parser.close()
+
+
+def parse_captions(payload: str, fmt: str | None = None) -> list[Segment]:
+    parser = CaptionParser(fmt)
+    segments = parser.feed(payload)
+    segments.extend(parser.close())
+    return segments
+
+
+def segments_to_text(segments) -> str:
+    text = " ".join(segment.text for segment in segments)
+    text = _SPACE_BEFORE_PUNCT.sub(r"\1", text)
+    return _MULTI_SPACE.sub(" ", text).strip()
+
+
+def captions_to_text(payload: str, fmt: str | None = None) -> str:
+    """Plain transcript text from a caption payload of any supported format."""
+    return segments_to_text(parse_captions(payload, fmt))
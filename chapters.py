@@ -0,0 +1,73 @@
+import asyncio
+import math
+import os
+
+from segment_store import SegmentStore
+from video_processing import (
+    SUMMARY_CHUNK_MAX_TOKENS, SUMMARY_CONCURRENCY, SummaryFailed, summarize_video,
+)
+
+# Videos without YouTube chapters are cut into windows of this many seconds,
+# widened if that would give more than CHAPTER_MAX of them.
+CHAPTER_SECONDS = float(os.environ.get("CHAPTER_SECONDS", "600"))
+CHAPTER_MAX = int(os.environ.get("CHAPTER_MAX", "60"))
+CHAPTER_PROMPT = (
+    "You are an assistant summarizing one chapter of a video transcript. "
+    "Summarize this chapter in one short paragraph, keeping key points, names, "
+    "numbers and conclusions. Do not add an introduction."
+)
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def chapter_spans(store: SegmentStore) -> list[dict]:
+    """The video's own chapters, or fixed windows over the captioned span."""
+    if store.chapters:
+        return store.chapters
+    if not len(store):
+        return []
+    first, last = store.starts[0], store.duration
+    window = max(CHAPTER_SECONDS, (last - first) / CHAPTER_MAX)
+    start = math.floor(first / window) * window
+    spans = []
+    while start < last:
+        end = min(start + window, last)
+        spans.append({"title": f"{format_timestamp(start)}–{format_timestamp(end)}",
+                      "start": start, "end": end})
+        start += window
+    return spans
+
+
+async def chapter_summaries(store: SegmentStore):
+    """Summarize every chapter concurrently, yielding ``(index, chapter)`` as each finishes.
+
+    Each chapter dict gets a ``summary`` (None for chapters without captions).
+    A chapter whose summary failed has ``summary`` None and an ``error``
+    instead of failing the others; ``Overloaded`` still ends the whole run.
+    """
+    slots = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+    async def summarize(index: int, chapter: dict) -> tuple[int, dict]:
+        text = store.text_between(chapter["start"], chapter["end"])
+        if not text:
+            return index, {**chapter, "summary": None}
+        async with slots:
+            try:
+                summary = await summarize_video(text, prompt=CHAPTER_PROMPT,
+                                                max_tokens=SUMMARY_CHUNK_MAX_TOKENS)
+            except SummaryFailed as e:
+                return index, {**chapter, "summary": None, "error": e.detail}
+        return index, {**chapter, "summary": summary}
+
+    tasks = [asyncio.ensure_future(summarize(i, c)) for i, c in enumerate(chapter_spans(store))]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,66 @@
+import math
+import re
+
+# Rough BPE ratio for English text; close enough for budgeting prompts
+# without pulling in a tokenizer.
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_sentences(text: str, max_tokens: int) -> list[str]:
+    """Split on sentence boundaries, breaking run-ons at word boundaries.
+
+    Auto-generated captions often have no punctuation at all, so any
+    "sentence" longer than ``max_tokens`` is cut into word-aligned pieces.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    sentences = []
+    for sentence in _SENTENCE_END.split(text.strip()):
+        if not sentence:
+            continue
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            sentences.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+def chunk_transcript(text: str, max_tokens: int, overlap_tokens: int = 0) -> list[str]:
+    """Pack sentences into chunks of at most ``max_tokens``.
+
+    Each chunk after the first starts with the trailing sentences of the
+    previous one (up to ``overlap_tokens``) so ideas spanning a boundary keep
+    their context.
+    """
+    chunks = []
+    current: list[str] = []
+    current_tokens = 0
+    for sentence in split_sentences(text, max_tokens):
+        tokens = estimate_tokens(sentence) + 1
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            overlap: list[str] = []
+            overlap_size = 0
+            for prev in reversed(current):
+                prev_tokens = estimate_tokens(prev) + 1
+                if overlap_size + prev_tokens > overlap_tokens:
+                    break
+                overlap.insert(0, prev)
+                overlap_size += prev_tokens
+            if overlap_size + tokens > max_tokens:
+                overlap, overlap_size = [], 0
+            current, current_tokens = overlap, overlap_size
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
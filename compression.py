@@ -0,0 +1,155 @@
+import asyncio
+import importlib.util
+import os
+import re
+import time
+from typing import NamedTuple
+
+from chunking import estimate_tokens, split_sentences
+from metrics import logger, record, record_compression
+
+# Off by default: compression trades some summary quality for fewer prompt
+# tokens. Needs numpy (in requirements.txt).
+SUMMARY_COMPRESSION = os.environ.get("SUMMARY_COMPRESSION", "0") == "1"
+# Token budget the kept sentences must fit in.
+SUMMARY_COMPRESSION_TOKENS = int(os.environ.get("SUMMARY_COMPRESSION_TOKENS", "4000"))
+# "textrank" (PageRank over sentence similarity) or "tfidf" (degree centrality).
+SUMMARY_COMPRESSION_METHOD = os.environ.get("SUMMARY_COMPRESSION_METHOD", "textrank")
+# Unpunctuated auto-captions are cut into pseudo-sentences of this size.
+COMPRESSION_SENTENCE_TOKENS = int(os.environ.get("COMPRESSION_SENTENCE_TOKENS", "60"))
+
+_BRACKETED = re.compile(r"\[[^\]]{0,40}\]|\([^)]{0,40}\)|♪+")
+_FILLERS = re.compile(r"\b(?:um+|uh+|erm+|hmm+|uh-huh|mhm)\b[,.]?\s*", re.IGNORECASE)
+_REPEATED_WORDS = re.compile(r"\b(\w+(?:\s+\w+){0,3})(?:\s+\1\b)+", re.IGNORECASE)
+_WORD = re.compile(r"[a-z0-9']+")
+
+_STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being
+below between both but by can could did do does doing don't down during each few for from
+further get got had has have having he her here hers him his how i i'm if in into is it it's
+its itself just know like me more most my no nor not now of off on once only or other our
+ours out over own really right same she should so some such than that that's the their them
+then there these they this those through to too under until up very was we were what when
+where which while who whom why will with would yeah you your yours
+""".split())
+
+
+class CompressionResult(NamedTuple):
+    text: str
+    original_tokens: int
+    tokens: int
+    seconds: float
+
+    @property
+    def ratio(self) -> float:
+        return self.tokens / self.original_tokens if self.original_tokens else 1.0
+
+
+def compression_enabled() -> bool:
+    if SUMMARY_COMPRESSION and importlib.util.find_spec("numpy") is None:
+        print("[compression] SUMMARY_COMPRESSION=1 but numpy is missing; sending full transcripts")
+        return False
+    return SUMMARY_COMPRESSION
+
+
+def normalize(text: str) -> str:
+    """Drop caption noise: [Music]-style cues, filler words, stuttered repeats."""
+    text = _BRACKETED.sub(" ", text)
+    text = _FILLERS.sub("", text)
+    text = _REPEATED_WORDS.sub(r"\1", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def dedupe(sentences: list[str]) -> list[str]:
+    seen = set()
+    unique = []
+    for sentence in sentences:
+        key = " ".join(_WORD.findall(sentence.lower()))
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(sentence)
+    return unique
+
+
+def _tfidf(sentences: list[str]):
+    import numpy as np
+
+    vocab: dict[str, int] = {}
+    rows, cols = [], []
+    for i, sentence in enumerate(sentences):
+        for word in _WORD.findall(sentence.lower()):
+            if word in _STOPWORDS:
+                continue
+            rows.append(i)
+            cols.append(vocab.setdefault(word, len(vocab)))
+    counts = np.zeros((len(sentences), max(len(vocab), 1)), dtype=np.float32)
+    np.add.at(counts, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1.0)
+
+    df = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(sentences)) / (1 + df)) + 1
+    weights = np.log1p(counts) * idf
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    return weights / np.where(norms == 0, 1, norms)
+
+
+def score_sentences(sentences: list[str], method: str = SUMMARY_COMPRESSION_METHOD):
+    """Centrality of each sentence in the cosine-similarity graph of their TF-IDF vectors."""
+    import numpy as np
+
+    vectors = _tfidf(sentences)
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0.0)
+    if method == "tfidf":
+        return similarity.sum(axis=1)
+
+    # TextRank: power iteration over the row-normalized similarity graph
+    n = len(sentences)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    transition = np.divide(similarity, out_weight, out=np.full_like(similarity, 1.0 / n),
+                           where=out_weight > 0)
+    damping = 0.85
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(100):
+        updated = (1 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < 1e-6:
+            break
+        scores = updated
+    return scores
+
+
+def compress_transcript(text: str, budget: int = SUMMARY_COMPRESSION_TOKENS,
+                        method: str = SUMMARY_COMPRESSION_METHOD) -> CompressionResult:
+    """Keep the most central sentences that fit in ``budget`` tokens, in their original order.
+
+    Text already within budget is only normalized and de-duplicated.
+    """
+    started = time.perf_counter()
+    original_tokens = estimate_tokens(text)
+    sentences = dedupe(split_sentences(normalize(text), COMPRESSION_SENTENCE_TOKENS))
+    kept = sentences
+    if sum(estimate_tokens(s) + 1 for s in sentences) > budget and len(sentences) > 1:
+        scores = score_sentences(sentences, method)
+        chosen = []
+        used = 0
+        for i in sorted(range(len(sentences)), key=lambda i: -float(scores[i])):
+            tokens = estimate_tokens(sentences[i]) + 1
+            if used + tokens > budget:
+                continue
+            chosen.append(i)
+            used += tokens
+            if budget - used < 2:
+                break
+        kept = [sentences[i] for i in sorted(chosen)]
+    compressed = " ".join(kept)
+    return CompressionResult(compressed, original_tokens, estimate_tokens(compressed),
+                             time.perf_counter() - started)
+
+
+async def compress_for_summary(transcript: str) -> str:
+    """Run compress_transcript off the event loop and record its ratio and timing."""
+    result = await asyncio.to_thread(compress_transcript, transcript)
+    record("compression", result.seconds)
+    record_compression(result.ratio)
+    logger.info("compressed transcript %d -> %d tokens (%.2f) in %.1f ms",
+                result.original_tokens, result.tokens, result.ratio, result.seconds * 1000)
+    return result.text
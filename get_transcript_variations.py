@@ -1,17 +1,14 @@
-
-import json
-import time
-import random
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api.formatters import TextFormatter
-import yt_dlp
 import re
-import requests
-import xml.etree.ElementTree as ET
-from urllib.parse import unquote
-from fastapi import HTTPException
+from caption_parser import Segment, parse_captions
+from metrics import stage
+from segment_store import SegmentStore
+from upstream_guard import UpstreamUnavailable, youtube
+from ytdlp_pool import borrow, raw_info, register_profile, resolve
 import os, glob, tempfile
 
+# yt_dlp and youtube_transcript_api are imported where they are used (or by
+# transcript_providers.warm_providers), so importing this module stays cheap.
+
 
 def extract_video_id(url):
     """Extract video ID from various YouTube URL formats"""
@@ -28,76 +25,41 @@ def extract_video_id(url):
     return None
 
 
-def parse_youtube_xml_captions(xml_content):
-    """Parse YouTube XML captions"""
+def parse_caption_segments(payload, fmt=None, chapters=None):
+    """Parse a caption payload into a timestamped SegmentStore (None if empty or unparseable)"""
     try:
-        # Clean up the XML content
-        xml_content = xml_content.replace('&', '&amp;')
-        
-        root = ET.fromstring(xml_content)
-        transcript_text = ""
-        
-        for text_elem in root.findall('.//text'):
-            if text_elem.text:
-                # Decode HTML entities
-                text = unquote(text_elem.text)
-                text = text.replace('&amp;', '&').replace('&lt;', '<').replace('&gt;', '>')
-                transcript_text += text + " "
-        
-        return transcript_text.strip()
-    
-    except Exception as e:
-        print(f"XML parsing error: {e}")
+        store = SegmentStore.from_segments(parse_captions(payload, fmt), chapters)
+    except ValueError as e:
+        print(f"Caption parsing error: {e}")
+        print(f"Response preview: {payload[:200]}...")
         return None
+    return store or None
 
-def parse_youtube_xml_captions(xml_content):
-    """Parse YouTube XML captions with better error handling"""
-    try:
-        # Check if response is actually XML
-        if not xml_content.strip().startswith('<?xml') and not xml_content.strip().startswith('<transcript'):
-            print("Response is not XML format")
-            return None
-        
-        # Clean up common XML issues
-        xml_content = xml_content.replace('&', '&amp;')
-        xml_content = xml_content.replace('&amp;amp;', '&amp;')
-        
-        root = ET.fromstring(xml_content)
-        transcript_text = ""
-        
-        # Handle different XML structures
-        text_elements = root.findall('.//text') or root.findall('.//p')
-        
-        for text_elem in text_elements:
-            if text_elem.text:
-                # Decode HTML entities
-                text = unquote(text_elem.text)
-                text = text.replace('&amp;', '&').replace('&lt;', '<').replace('&gt;', '>')
-                text = text.replace('\n', ' ').strip()
-                if text:
-                    transcript_text += text + " "
-        
-        return transcript_text.strip()
-    except ET.ParseError as e:
-        print(f"XML parsing error: {e}")
-        print(f"Response preview: {xml_content[:200]}...")
-        return None
-    except Exception as e:
-        print(f"General parsing error: {e}")
+def _caption_body(response):
+    """Text of a caption download; None if the track does not exist, raises on other failures"""
+    if response.status_code == 404:
         return None
+    response.raise_for_status()
+    return response.text if response.text.strip() else None
+
+# Providers return None only when the video has no English captions; any
+# other failure is raised, so the provider race does not cache it as "no
+# captions" (see transcript_providers.fetch_transcript).
 
 def get_english_transcript_v1(video_url):
     """Method 1: Using youtube-transcript-api with better error handling"""
+    video_id = extract_video_id(video_url)
+    if not video_id:
+        return None
+
+    from youtube_transcript_api import (
+        NoTranscriptFound, TranscriptsDisabled, VideoUnavailable, YouTubeTranscriptApi,
+    )
+
     try:
-        video_id = extract_video_id(video_url)
-        if not video_id:
-            return None
-        
-        # Add delay to avoid rate limiting
-        time.sleep(random.uniform(0.5, 1.5))
-        
         # Try to get English transcript
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+        with youtube.guard():
+            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
         
         # Try manual first, then auto-generated
         try:
@@ -105,182 +67,176 @@ def get_english_transcript_v1(video_url):
         except:
             try:
                 transcript = transcript_list.find_generated_transcript(['en'])
-            except Exception as e:
+            except NoTranscriptFound as e:
                 print(f"No English transcript available: {e}")
                 return None
         
         # Get transcript data
-        transcript_data = transcript.fetch()
+        with youtube.guard():
+            transcript_data = transcript.fetch()
+        if hasattr(transcript_data, "to_raw_data"):
+            transcript_data = transcript_data.to_raw_data()
         
-        # Manual formatting instead of TextFormatter
-        transcript_text = ""
-        for entry in transcript_data:
-            transcript_text += entry['text'] + " "
+        # Manual formatting instead of TextFormatter, keeping the timings
+        return SegmentStore.from_segments(
+            Segment(entry['start'], entry['duration'], entry['text']) for entry in transcript_data
+        ) or None
         
-        return transcript_text.strip()
-        
-    except Exception as e:
-        print(f"Method 1 failed: {e}")
-        return None   
+    except (NoTranscriptFound, TranscriptsDisabled, VideoUnavailable) as e:
+        print(f"Method 1: no English transcript: {e}")
+        return None
+
+V2_YDL_OPTS = {
+    'writeautomaticsub': True,
+    'writesubtitles': True,
+    'subtitleslangs': ['en'],
+    'skip_download': True,
+    'quiet': True,
+    'no_warnings': True,
+    'sleep_interval': 2,
+    'max_sleep_interval': 5,
+    'extractor_retries': 2,
+    'http_headers': {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    }
+}
+register_profile("ytdlp_urls", V2_YDL_OPTS)
 
 def get_english_transcript_v2(video_url):
     """Method 2: Using yt-dlp with caption parsing"""
-    try:
-        ydl_opts = {
-            'writeautomaticsub': True,
-            'writesubtitles': True,
-            'subtitleslangs': ['en'],
-            'skip_download': True,
-            'quiet': True,
-            'no_warnings': True,
-            'sleep_interval': 2,
-            'max_sleep_interval': 5,
-            'extractor_retries': 2,
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            }
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            time.sleep(random.uniform(2, 4))
-            
-            info = ydl.extract_info(video_url, download=False)
-            
-            # Try manual subtitles first
-            if 'subtitles' in info and 'en' in info['subtitles']:
-                subtitle_url = info['subtitles']['en'][0]['url']
-                response = requests.get(subtitle_url, timeout=10)
-                if response.status_code == 200:
-                    return parse_youtube_xml_captions(response.text)
-            
-            # Try auto captions
-            elif 'automatic_captions' in info and 'en' in info['automatic_captions']:
-                subtitle_url = info['automatic_captions']['en'][0]['url']
-                response = requests.get(subtitle_url, timeout=10)
-                if response.status_code == 200:
-                    return parse_youtube_xml_captions(response.text)
-                
-    except Exception as e:
-        print(f"Method 2 failed: {e}")
+    with borrow("ytdlp_urls") as ydl:
+        with stage("metadata", provider="ytdlp_urls"):
+            info = resolve(ydl, video_url, extract_video_id(video_url))
+
+    # Try manual subtitles first, then auto captions
+    for key in ('subtitles', 'automatic_captions'):
+        tracks = (info.get(key) or {}).get('en')
+        if not tracks:
+            continue
+        with stage("caption_download", provider="ytdlp_urls"):
+            response = youtube.get(tracks[0]['url'], timeout=10)
+        body = _caption_body(response)
+        if body:
+            with stage("parse", provider="ytdlp_urls"):
+                return parse_caption_segments(body, chapters=info.get("chapters"))
         return None
+    return None
 EN_CODES = ["en", "en-US", "en-GB"]
+YOUTUBE_TIMEDTEXT_URL = os.environ.get("YOUTUBE_TIMEDTEXT_URL", "https://www.youtube.com/api/timedtext")
 
 def get_english_transcript_v3(video_url):
     """Method 3: Direct API approach"""
-    try:
-        video_id = extract_video_id(video_url)
-        if not video_id:
-            return None
-        
-        # Try direct YouTube API approach
-        base_url = "https://www.youtube.com/api/timedtext"
-        params = {
-            'v': video_id,
-            'lang': 'en',
-            'fmt': 'srv3'
-        }
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        time.sleep(random.uniform(1, 2))
-        response = requests.get(base_url, params=params, headers=headers, timeout=10)
-        
-        if response.status_code == 200 and response.text.strip():
-            return parse_youtube_xml_captions(response.text)
-            
-    except Exception as e:
-        print(f"Method 3 failed: {e}")
+    video_id = extract_video_id(video_url)
+    if not video_id:
         return None
-    
 
-def json3_to_text(payload: str) -> str:
-    """Convert a json3 captions payload (string) into plain text."""
-    data = json.loads(payload)
-    parts = []
-    for ev in data.get("events", []):
-        segs = ev.get("segs")
-        if not segs:
-            continue
-        tokens = []
-        for seg in segs:
-            t = seg.get("utf8", "")
-            if t == "\n":
-                continue
-            tokens.append(t)
-        if tokens:
-            parts.append("".join(tokens))
-    # fix spaces before punctuation, collapse multiples
-    text = " ".join(parts)
-    text = re.sub(r"\s+([.,!?;:])", r"\1", text)
-    text = re.sub(r"\s{2,}", " ", text).strip()
-    return text
-
-def vtt_to_text(vtt: str) -> str:
-    """Convert a WEBVTT payload (string) into plain text."""
-    lines = []
-    for line in vtt.splitlines():
-        s = line.strip()
-        if not s or s.startswith("WEBVTT") or "-->" in s or s.isdigit():
-            continue
-        s = (s.replace("<c>", "").replace("</c>", "")
-               .replace("<b>", "").replace("</b>", "")
-               .replace("<i>", "").replace("</i>", ""))
-        lines.append(s)
-    text = " ".join(lines)
-    text = re.sub(r"\s+([.,!?;:])", r"\1", text).strip()
-    return text
-
-# def get_english_transcript(url: str) -> str | None:
-#     """
-#     Straightforward: ask yt-dlp for English captions, prefer json3 (easiest to parse),
-#     else fall back to VTT. Returns plain text or None.
-#     """
-#     ydl_opts = {
-#         "skip_download": True,
-#         "quiet": True,
-#         "no_warnings": True,
-#         "writeautomaticsub": True,               # auto-CC
-#         "subtitleslangs": EN_CODES,              # en variants
-#         "subtitlesformat": "json3",              # ask for json3 first
-#         "extractor_args": {"youtube": {"player_client": ["ios","web"]}},
-#     }
-#     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-#         info = ydl.extract_info(url, download=False)
-
-#     # Prefer json3 if available
-#     for key in ("automatic_captions", "requested_subtitles", "subtitles"):
-#         tracks_by_lang = info.get(key) or {}
-#         for code in EN_CODES:
-#             tracks = tracks_by_lang.get(code)
-#             if not tracks:
-#                 continue
-#             track = tracks[0] if isinstance(tracks, list) else tracks
-#             track_url = track.get("url")
-#             ext = (track.get("ext") or track.get("format"))  # ext can be 'json3' | 'vtt' | ...
-#             if not track_url:
-#                 continue
-
-#             headers = {
-#                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36',
-#             }
-#             resp = requests.get(track_url, headers=headers, timeout=20)
-#             resp.raise_for_status()
-#             if (ext or "").lower() == "json3" or (track_url and "fmt=json3" in track_url):
-#                 print("error here")
-#                 return json3_to_text(resp.text)
-#             else:
-#                 # fallback: treat as VTT
-#                 return vtt_to_text(resp.text)
-
-#     return None
+    # Try direct YouTube API approach
+    base_url = YOUTUBE_TIMEDTEXT_URL
+    params = {
+        'v': video_id,
+        'lang': 'en',
+        'fmt': 'srv3'
+    }
+
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    }
+
+    with stage("caption_download", provider="timedtext"):
+        response = youtube.get(base_url, params=params, headers=headers, timeout=10)
 
+    # YouTube answers 200 with an empty body when there is no such track
+    body = _caption_body(response)
+    if body:
+        with stage("parse", provider="timedtext"):
+            return parse_caption_segments(body)
+    return None
 
 
 EN_CODES = ["en", "en-US", "en-GB", "en-IN"]
 
-def get_english_transcript(url: str) -> str | None:
+# "memory" (default) pulls the caption payload through yt-dlp's own request
+# machinery into a buffer; "disk" keeps the old write-to-tempdir path.
+CAPTION_CAPTURE = os.environ.get("CAPTION_CAPTURE", "memory")
+
+
+YDL_OPTS = {
+    "skip_download": True,
+    "quiet": True,
+    "no_warnings": True,
+    "writesubtitles": True,
+    "writeautomaticsub": True,
+    "subtitleslangs": EN_CODES[:1],
+    "subtitlesformat": "json3/vtt/best",
+    "geo_bypass": True,
+    # keep yt-dlp's player/signature cache off the filesystem too
+    "cachedir": False,
+    # If you still see 403, uncomment one of these:
+    # "cookiesfrombrowser": ("chrome",),   # uses your Chrome session
+    # "cookiefile": "/path/to/cookies.txt",
+}
+register_profile("ytdlp_download", YDL_OPTS)
+
+
+def get_english_transcript(url: str) -> SegmentStore | None:
+    if CAPTION_CAPTURE == "disk":
+        return _get_english_transcript_on_disk(url)
+
+    with borrow("ytdlp_download") as ydl:
+        with stage("metadata", provider="ytdlp_download"):
+            info = resolve(ydl, url, extract_video_id(url))
+        return capture_captions(ydl, info, EN_CODES[:1])
+
+
+def capture_captions(ydl, info: dict, codes: list[str]) -> SegmentStore | None:
+    """Download the chosen caption track into memory and return its segments.
+
+    Goes through ``ydl.urlopen`` with the track's (or video's) http_headers,
+    so cookies, proxies and headers match what ``ydl.download`` would use.
+    Prefers json3 and falls back to a VTT track of the same language.
+    """
+    from yt_dlp.networking import Request as YtdlpRequest
+
+    requested = info.get("requested_subtitles") or {}
+    failure = None
+    for code in codes:
+        candidates = []
+        if requested.get(code):
+            candidates.append(requested[code])
+        for key in ("subtitles", "automatic_captions"):
+            candidates.extend(
+                t for t in (info.get(key) or {}).get(code) or [] if t.get("ext") == "vtt"
+            )
+        for track in candidates:
+            ext = (track.get("ext") or "").lower()
+            if ext not in ("json3", "vtt"):
+                continue
+            try:
+                data = track.get("data")
+                if data is None:
+                    headers = track.get("http_headers") or info.get("http_headers") or {}
+                    with stage("caption_download", provider="ytdlp_download"), youtube.guard():
+                        with ydl.urlopen(YtdlpRequest(track["url"], headers=headers)) as resp:
+                            data = resp.read().decode("utf-8", errors="ignore")
+            except UpstreamUnavailable:
+                raise
+            except Exception as e:
+                print(f"[get_english_transcript] {code}.{ext} download failed: {e}")
+                failure = e
+                continue
+            with stage("parse", provider="ytdlp_download"):
+                store = parse_caption_segments(data, ext, info.get("chapters"))
+            if store:
+                return store
+    if failure is not None:
+        # a track exists but could not be fetched: that is not "no captions"
+        raise failure
+    return None
+
+
+def _get_english_transcript_on_disk(url: str) -> SegmentStore | None:
+    import yt_dlp
+
     with tempfile.TemporaryDirectory() as td:
         ydl_opts = {
             "skip_download": True,
@@ -292,25 +248,19 @@ def get_english_transcript(url: str) -> str | None:
             "subtitlesformat": "json3",
             "outtmpl": os.path.join(td, "%(id)s.%(ext)s"),
             "geo_bypass": True,
-            # If you still see 403, uncomment one of these:
-            # "cookiesfrombrowser": ("chrome",),   # uses your Chrome session
-            # "cookiefile": "/path/to/cookies.txt",
         }
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            ydl.download([url])  # yt-dlp fetches subs with correct headers/cookies
+            raw = raw_info(ydl, url, extract_video_id(url))
+            # process the resolved info once more, this time writing the
+            # subs (yt-dlp fetches them with correct headers/cookies)
+            with youtube.guard():
+                info = ydl.process_ie_result(raw, download=True)
 
         vid = info["id"]
-        # Prefer json3; fallback to vtt
         for code in EN_CODES[:1]:
             p_json = glob.glob(os.path.join(td, f"{vid}.{code}.json3"))
             if p_json:
                 data = open(p_json[0], "r", encoding="utf-8", errors="ignore").read()
-                return json3_to_text(data)
-            # p_vtt = glob.glob(os.path.join(td, f"{vid}.{code}.vtt"))
-            # if p_vtt:
-            #     data = open(p_vtt[0], "r", encoding="utf-8", errors="ignore").read()
-            #     return vtt_to_text(data)
-        
+                return parse_caption_segments(data, "json3", info.get("chapters"))
 
     return None
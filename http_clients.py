@@ -0,0 +1,82 @@
+import importlib.util
+import os
+import threading
+
+import httpx
+
+# Async client (Together AI and other async upstreams)
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "30"))
+# HTTP/2 needs the optional ``h2`` package (pip install "httpx[http2]").
+HTTP2 = os.environ.get("HTTP2", "0") == "1"
+
+# Sync session used by the caption fetchers running in the transcript pool.
+# requests is imported when the session is first built (startup warm-up or
+# the first caption fetch), not at import time.
+CAPTION_POOL_SIZE = int(os.environ.get("CAPTION_POOL_SIZE", "16"))
+
+_async_client: httpx.AsyncClient | None = None
+_session = None
+_session_lock = threading.Lock()
+
+
+def _http2_available() -> bool:
+    if HTTP2 and importlib.util.find_spec("h2") is None:
+        print("[http_clients] HTTP2=1 but the 'h2' package is missing; using HTTP/1.1")
+        return False
+    return HTTP2
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Application-wide AsyncClient with keep-alive and bounded connections."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            http2=_http2_available(),
+            timeout=httpx.Timeout(HTTP_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _async_client
+
+
+def get_session():
+    """Process-wide requests.Session whose pool blocks instead of opening extra sockets."""
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=CAPTION_POOL_SIZE,
+                    pool_maxsize=CAPTION_POOL_SIZE,
+                    pool_block=True,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+async def open_clients() -> None:
+    # the sync session is built by transcript_providers.warm_providers
+    get_async_client()
+
+
+async def close_clients() -> None:
+    global _async_client, _session
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,358 @@
+import argparse
+import asyncio
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+from fastapi import HTTPException
+
+from get_transcript_variations import extract_video_id
+from http_clients import close_clients, get_async_client, open_clients
+from pipeline import load_transcript
+from transcript_executor import get_executor, shutdown_executor
+from upstream_guard import invidious_pool
+from video_processing import summarize_video
+
+JOBS_DB = os.environ.get("JOBS_DB", ".cache/jobs.sqlite3")
+# Workers started inside each API process; 0 leaves the queue to standalone
+# workers (python jobs.py --workers N) sharing the same JOBS_DB.
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1"))
+# A running job whose lease lapses (worker crashed or restarted) is picked
+# up again. Live workers keep renewing the lease.
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+WEBHOOK_RETRIES = int(os.environ.get("WEBHOOK_RETRIES", "3"))
+# Optional comma-separated hosts webhooks may go to (".example.com" also
+# allows subdomains). Unset, any host is allowed whose addresses are all
+# public; loopback, private, link-local (cloud metadata) and other
+# non-global addresses are refused.
+WEBHOOK_ALLOWED_HOSTS = [
+    host.strip().lower() for host in os.environ.get("WEBHOOK_ALLOWED_HOSTS", "").split(",")
+    if host.strip()
+]
+
+_COLUMNS = ("id", "video_url", "webhook_url", "status", "result", "error",
+            "attempts", "created_at", "updated_at")
+
+
+class JobStore:
+    """SQLite-backed job table, safe to share between processes."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.db_path, check_same_thread=False,
+                                 isolation_level=None, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " video_url TEXT NOT NULL,"
+                " webhook_url TEXT,"
+                " status TEXT NOT NULL,"
+                " result TEXT,"
+                " error TEXT,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " lease_until REAL,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            self._db = db
+        return self._db
+
+    def create(self, video_url: str, webhook_url: str | None = None) -> dict:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO jobs (id, video_url, webhook_url, status, created_at, updated_at)"
+                " VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, video_url, webhook_url, now, now),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._connect().execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(_COLUMNS, row))
+        if job["result"] is not None:
+            job["result"] = json.loads(job["result"])
+        return job
+
+    def claim(self) -> dict | None:
+        """Atomically take the oldest queued (or lease-expired) job.
+
+        Lease-expired jobs are only taken while they have attempts left; see
+        ``fail_abandoned`` for the rest.
+        """
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT id FROM jobs"
+                    " WHERE status = 'queued'"
+                    " OR (status = 'running' AND lease_until < ? AND attempts < ?)"
+                    " ORDER BY created_at LIMIT 1",
+                    (now, JOB_MAX_ATTEMPTS),
+                ).fetchone()
+                if row is None:
+                    db.execute("COMMIT")
+                    return None
+                db.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1,"
+                    " lease_until = ?, updated_at = ? WHERE id = ?",
+                    (now + JOB_LEASE_SECONDS, now, row[0]),
+                )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return self.get(row[0])
+
+    def fail_abandoned(self) -> list[dict]:
+        """Mark lease-expired jobs that used up their attempts as failed; returns them.
+
+        A job that keeps taking its worker down (OOM, hard crash) ends here
+        instead of being retried forever.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._connect().execute(
+                "UPDATE jobs SET status = 'failed', error = ?, lease_until = NULL, updated_at = ?"
+                " WHERE status = 'running' AND lease_until < ? AND attempts >= ?"
+                " RETURNING id",
+                (f"Worker lost the job {JOB_MAX_ATTEMPTS} times", now, now, JOB_MAX_ATTEMPTS),
+            ).fetchall()
+        return [self.get(job_id) for (job_id,) in rows]
+
+    def renew(self, job_id: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._connect().execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ?"
+                " WHERE id = ? AND status = 'running'",
+                (now + JOB_LEASE_SECONDS, now, job_id),
+            )
+
+    def finish(self, job_id: str, status: str, result: dict | None = None,
+               error: str | None = None) -> None:
+        with self._lock:
+            self._connect().execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, lease_until = NULL,"
+                " updated_at = ? WHERE id = ?",
+                (status, None if result is None else json.dumps(result), error,
+                 time.time(), job_id),
+            )
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+
+job_store = JobStore(JOBS_DB)
+
+
+def check_webhook_url(url: str) -> str | None:
+    """Raise ValueError unless ``url`` is an http(s) URL the server may POST to.
+
+    Returns the checked address to connect to, or None for an allow-listed
+    host. Resolves the host when there is no allow-list, so call it off the
+    event loop.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("webhook_url must be an http(s) URL")
+    host = parsed.hostname.lower()
+    if WEBHOOK_ALLOWED_HOSTS:
+        if not any(host == allowed or (allowed.startswith(".") and host.endswith(allowed))
+                   for allowed in WEBHOOK_ALLOWED_HOSTS):
+            raise ValueError("webhook_url host is not allowed")
+        return None
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise ValueError("webhook_url host does not resolve")
+    addresses = [ipaddress.ip_address(info[4][0].split("%")[0]) for info in infos]
+    if not all(address.is_global for address in addresses):
+        raise ValueError("webhook_url must point to a public address")
+    return str(addresses[0])
+
+
+def _pinned(url: str, address: str) -> tuple[str, dict, dict]:
+    """URL, headers and extensions that send a request for ``url`` to ``address``.
+
+    The Host header and TLS server name (SNI and certificate check) stay
+    those of the original host; only the connection skips a second lookup,
+    which could resolve to somewhere else by then (DNS rebinding).
+    """
+    parsed = urlparse(url)
+    userinfo, _, host = parsed.netloc.rpartition("@")
+    netloc = f"[{address}]" if ":" in address else address
+    if parsed.port:
+        netloc += f":{parsed.port}"
+    if userinfo:
+        netloc = f"{userinfo}@{netloc}"
+    return (parsed._replace(netloc=netloc).geturl(), {"Host": host},
+            {"sni_hostname": parsed.hostname})
+
+
+async def _run_job(job: dict) -> tuple[str, dict | None, str | None]:
+    video_url = job["video_url"]
+    video_id = extract_video_id(video_url)
+    try:
+        if not video_id:
+            raise HTTPException(status_code=400, detail="Invalid YouTube URL")
+        transcript = await load_transcript(video_id, video_url)
+        if not transcript:
+            return "done", {"message": "No auto‑CC found"}, None
+        # SummaryFailed (an HTTPException) when the LLM call fails
+        summary = await summarize_video(transcript.text)
+        if not summary:
+            raise HTTPException(status_code=502, detail="Failed to get the summary.")
+    except HTTPException as e:
+        return "failed", None, e.detail
+    return "done", {"summary": summary}, None
+
+
+async def _notify(job: dict) -> None:
+    # checked again at send time, and the request goes to the address that
+    # passed the check: DNS may have changed since the job was queued
+    try:
+        address = await asyncio.to_thread(check_webhook_url, job["webhook_url"])
+    except ValueError as e:
+        print(f"[jobs] not calling the webhook for {job['id']}: {e}")
+        return
+    url, headers, extensions = job["webhook_url"], {}, {}
+    if address is not None:
+        url, headers, extensions = _pinned(url, address)
+    payload = {k: job[k] for k in ("id", "video_url", "status", "result", "error")}
+    for attempt in range(WEBHOOK_RETRIES):
+        try:
+            response = await get_async_client().post(url, json=payload, headers=headers,
+                                                     extensions=extensions)
+            if response.status_code < 500:
+                return
+        except Exception as e:
+            print(f"[jobs] webhook for {job['id']} failed: {e!r}")
+        await asyncio.sleep(2 ** attempt)
+
+
+class JobWorkers:
+    """Pool of asyncio workers draining the job store."""
+
+    def __init__(self, store: JobStore, count: int):
+        self.store = store
+        self.count = count
+        self.wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.count)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers right away after a submit in this process."""
+        self.wakeup.set()
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim)
+            except Exception as e:
+                print(f"[jobs] claim failed: {e!r}")
+                job = None
+            if job is None:
+                try:
+                    for failed in await asyncio.to_thread(self.store.fail_abandoned):
+                        print(f"[jobs] job {failed['id']} abandoned after {failed['attempts']} attempts")
+                        if failed.get("webhook_url"):
+                            await _notify(failed)
+                except Exception as e:
+                    print(f"[jobs] sweeping abandoned jobs failed: {e!r}")
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._process(job)
+
+    async def _process(self, job: dict) -> None:
+        async def keep_lease():
+            while True:
+                await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+                await asyncio.to_thread(self.store.renew, job["id"])
+
+        lease = asyncio.ensure_future(keep_lease())
+        try:
+            status, result, error = await _run_job(job)
+        except asyncio.CancelledError:
+            # shutting down: hand the job straight back to the queue
+            await asyncio.to_thread(self.store.finish, job["id"], "queued")
+            raise
+        except Exception as e:
+            print(f"[jobs] job {job['id']} crashed: {e!r}")
+            # retry crashed jobs a few times before giving up
+            status = "queued" if job["attempts"] < JOB_MAX_ATTEMPTS else "failed"
+            result, error = None, str(e) or repr(e)
+        finally:
+            lease.cancel()
+        await asyncio.to_thread(self.store.finish, job["id"], status, result, error)
+        if status in ("done", "failed") and job.get("webhook_url"):
+            await _notify(await asyncio.to_thread(self.store.get, job["id"]))
+
+
+async def _run_standalone(count: int) -> None:
+    get_executor()
+    await open_clients()
+    workers = JobWorkers(job_store, count)
+    workers.start()
+    invidious_pool.start()
+    print(f"[jobs] {count} workers polling {JOBS_DB}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await invidious_pool.stop()
+        await workers.stop()
+        await close_clients()
+        shutdown_executor()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run summary job workers without the API.")
+    parser.add_argument("--workers", type=int, default=max(JOB_WORKERS, 1))
+    args = parser.parse_args()
+    try:
+        asyncio.run(_run_standalone(args.workers))
+    except KeyboardInterrupt:
+        pass
@@ -1,10 +1,57 @@
-from fastapi import FastAPI, HTTPException
-from base_models import VideoURLRequest
-from get_transcript_variations import get_english_transcript
-from video_processing import summarize_video
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from base_models import BatchSummaryRequest, JobRequest, VideoURLRequest
+from batch import BATCH_MAX_ITEMS, expand_playlist, run_batch
+from jobs import JOB_WORKERS, JobWorkers, check_webhook_url, job_store
+from get_transcript_variations import extract_video_id
+from video_processing import router, summarize_video, stream_summary, summary_flight
+from transcript_cache import transcript_cache
+from summary_cache import summary_cache
+from summary_tree import summarize_tree, summary_tree
+from pipeline import load_transcript, select_range, transcript_flight
+from pipelined import SUMMARY_PIPELINE, pipeline_flight, pipelined_summary
+from chapters import chapter_summaries
+from http_clients import open_clients, close_clients
+from metrics import ServerTimingMiddleware, log_payload, record
+from transcript_executor import get_executor, shutdown_executor
+from transcript_providers import provider_stats, warm_providers
+from upstream_guard import invidious_pool, upstream_stats
+from ytdlp_pool import close_pools, ytdlp_stats
+from admission import AdmissionMiddleware, admission_stats, check_capacity
 from fastapi.middleware.cors import CORSMiddleware
-from transcript_text import test_transcript
-app = FastAPI()
+
+
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
+# httpx logs every upstream request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_executor()
+    await open_clients()
+    app.state.job_workers = JobWorkers(job_store, JOB_WORKERS)
+    app.state.job_workers.start()
+    invidious_pool.start()
+    # import provider libraries and build yt-dlp instances off the request path
+    warmup = asyncio.create_task(asyncio.to_thread(warm_providers))
+    yield
+    await invidious_pool.stop()
+    await asyncio.gather(warmup, return_exceptions=True)
+    close_pools()
+    await app.state.job_workers.stop()
+    await close_clients()
+    shutdown_executor()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,42 +61,239 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-INVIDIOUS_INSTANCES = [
-    "https://yewtu.be",
-    "https://yewtu.eu",
-    "https://yewtu.kavin.rocks",
-    "https://yewtu.snopyta.org",
-    "https://yewtu.imy.at",
-    "https://yewtu.cloud",
-]
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(AdmissionMiddleware)
 
 @app.get("/ping")
 async def ping():
     return {"message": "pong"}
 
 
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "transcripts": transcript_cache.stats(),
+        "summaries": summary_cache.stats(),
+        "summary_tree": summary_tree.stats(),
+        "transcript_flight": transcript_flight.stats(),
+        "summary_flight": summary_flight.stats(),
+        "pipeline_flight": pipeline_flight.stats(),
+        "ytdlp": ytdlp_stats(),
+    }
+
+
+@app.get("/providers/stats")
+async def providers_stats():
+    return provider_stats()
+
+
+@app.get("/upstreams/stats")
+async def upstreams_stats():
+    return upstream_stats()
+
+
+@app.get("/routes/stats")
+async def routes_stats():
+    return router.stats()
+
+
+@app.get("/admission/stats")
+async def admission_stats_endpoint():
+    return admission_stats()
+
+
 @app.post("/summary")
 async def get_summary(request: VideoURLRequest):
 
 
     video_url = request.video_url
-    # vid_id = get_video_id(video_url)
-    # if not vid_id:
-    #     raise HTTPException(status_code=400, detail="Invalid YouTube URL")
-    # try:
+    started = time.perf_counter()
+    video_id = extract_video_id(video_url)
+    record("id_extraction", time.perf_counter() - started)
+    if not video_id:
+        raise HTTPException(status_code=400, detail="Invalid YouTube URL")
+    check_capacity()
 
     url = "https://www.youtube.com/watch?v=i4b_ETwPoTE&ab_channel=HiteshChoudhary"
     test_url = "https://youtu.be/LS1AszxJypc?si=m73HLwCK0Y09gan6"
-    
-    transcript = get_english_transcript(video_url)
+
+    whole_video = (request.start is None and request.end is None
+                   and not request.chapters and not request.detail)
+    if SUMMARY_PIPELINE and whole_video:
+        summary = await pipelined_summary(video_id)
+        if summary:
+            return {"summary": summary}
+
+    transcript = await load_transcript(video_id, video_url)
 
     if transcript:
-        print("this is transcript",transcript)
+        log_payload("transcript", transcript.text)
     else:
         return {"message": "No auto‑CC found"}
 
-    summary = await summarize_video(transcript)
+    transcript = select_range(transcript, request.start, request.end, request.chapters)
+    if not transcript:
+        return {"message": "No captions in the requested range"}
+    if request.chapters:
+        results = {index: chapter async for index, chapter in chapter_summaries(transcript)}
+        chapters = [results[i] for i in sorted(results)]
+        return {"chapters": chapters}
+    if request.detail:
+        try:
+            tree = await summarize_tree(transcript.text, request.detail)
+        except HTTPException:
+            raise
+        except Exception as e:
+            print("Summary tree failed:", repr(e))
+            raise HTTPException(status_code=502, detail="Failed to get the summary.")
+        return {"summary": tree["summary"], "detail": request.detail, "sections": tree["sections"]}
+
+    # raises SummaryFailed (502) when the LLM call fails
+    summary = await summarize_video(transcript.text)
     if summary:
         return {"summary": summary}
     else:
-        raise HTTPException(status_code=500, detail="Failed to get the summary.")
\ No newline at end of file
+        raise HTTPException(status_code=502, detail="Failed to get the summary.")
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/summary/stream")
+async def get_summary_stream(request: VideoURLRequest, http_request: Request):
+    """Server-Sent Events variant of /summary.
+
+    Emits ``progress`` events per stage, ``token`` events as the summary is
+    generated, then ``done`` (or ``error``). The upstream completion is closed
+    as soon as the client disconnects. In chapter mode each chapter arrives
+    as a ``chapter`` event, in completion order, instead of tokens.
+    """
+    video_id = extract_video_id(request.video_url)
+    if not video_id:
+        raise HTTPException(status_code=400, detail="Invalid YouTube URL")
+    check_capacity()
+
+    async def events():
+        yield sse_event("progress", {"stage": "transcript", "status": "started"})
+        try:
+            transcript = await load_transcript(video_id, request.video_url)
+        except HTTPException as e:
+            yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+            return
+        if not transcript:
+            yield sse_event("error", {"status_code": 404, "detail": "No auto‑CC found"})
+            return
+        try:
+            transcript = select_range(transcript, request.start, request.end, request.chapters)
+        except HTTPException as e:
+            yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+            return
+        if not transcript:
+            yield sse_event("error", {"status_code": 404,
+                                      "detail": "No captions in the requested range"})
+            return
+        yield sse_event("progress", {"stage": "transcript", "status": "done",
+                                     "characters": len(transcript.text)})
+
+        yield sse_event("progress", {"stage": "summary", "status": "started"})
+        if request.chapters:
+            chapters = chapter_summaries(transcript)
+            try:
+                async for index, chapter in chapters:
+                    if await http_request.is_disconnected():
+                        break
+                    yield sse_event("chapter", {"index": index, **chapter})
+                else:
+                    yield sse_event("done", {})
+            except HTTPException as e:
+                yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+            finally:
+                await chapters.aclose()
+            return
+        if request.detail:
+            try:
+                tree = await summarize_tree(transcript.text, request.detail)
+            except HTTPException as e:
+                yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+                return
+            except Exception as e:
+                print("Summary tree failed:", repr(e))
+                yield sse_event("error", {"status_code": 502, "detail": "Failed to get the summary."})
+                return
+            yield sse_event("token", {"text": tree["summary"]})
+            yield sse_event("done", {"sections": tree["sections"]})
+            return
+
+        summary_stream = stream_summary(transcript.text)
+        try:
+            async for delta in summary_stream:
+                if await http_request.is_disconnected():
+                    break
+                yield sse_event("token", {"text": delta})
+            else:
+                yield sse_event("done", {})
+        except HTTPException as e:
+            yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            print("Streaming summary failed:", repr(e))
+            yield sse_event("error", {"status_code": 502, "detail": "Failed to get the summary."})
+        finally:
+            await summary_stream.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/summary/batch")
+async def get_summary_batch(request: BatchSummaryRequest):
+    """Summarize a list of videos and/or a playlist.
+
+    Streams newline-delimited JSON, one object per video in completion order,
+    followed by a totals line. Per-video failures do not fail the batch.
+    """
+    video_urls = list(request.video_urls)
+    if request.playlist_url:
+        video_urls.extend(await expand_playlist(request.playlist_url))
+    if not video_urls:
+        raise HTTPException(status_code=400, detail="No videos to summarize")
+    if len(video_urls) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400,
+                            detail=f"A batch is limited to {BATCH_MAX_ITEMS} videos")
+
+    return StreamingResponse(run_batch(video_urls), media_type="application/x-ndjson")
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: JobRequest, http_request: Request):
+    """Queue a summary job and return its ID immediately.
+
+    Poll ``GET /jobs/{id}``, or pass ``webhook_url`` to have the finished job
+    POSTed to you.
+    """
+    if not extract_video_id(request.video_url):
+        raise HTTPException(status_code=400, detail="Invalid YouTube URL")
+    if request.webhook_url:
+        try:
+            await asyncio.to_thread(check_webhook_url, request.webhook_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    job = await asyncio.to_thread(job_store.create, request.video_url, request.webhook_url)
+    http_request.app.state.job_workers.notify()
+    return {"job_id": job["id"], "status": job["status"]}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
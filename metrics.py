@@ -0,0 +1,124 @@
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger("video_summarizer")
+
+# Fraction of requests whose full transcript / summary text is logged.
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get("LOG_PAYLOAD_SAMPLE_RATE", "0"))
+LOG_PAYLOAD_MAX_CHARS = int(os.environ.get("LOG_PAYLOAD_MAX_CHARS", "2000"))
+
+STAGE_SECONDS = Histogram(
+    "summary_stage_seconds",
+    "Time spent in each stage of the summary pipeline.",
+    ["stage", "provider", "cache"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120),
+)
+COMPRESSION_RATIO = Histogram(
+    "summary_compression_ratio",
+    "Tokens kept by transcript pre-compression, as a fraction of the original.",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+)
+CACHE_LOOKUPS = Counter(
+    "summary_cache_lookups_total",
+    "Transcript and summary cache lookups by result.",
+    ["cache", "result"],
+)
+ADMISSIONS = Counter(
+    "summary_admission_total",
+    "Admission control decisions per pipeline stage.",
+    ["stage", "outcome"],
+)
+
+# Stage timings of the current request, rendered as a Server-Timing header.
+# The list is shared (not copied) with executor threads that inherit the
+# context, so provider stages running there show up too.
+_request_timings: ContextVar[list | None] = ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> list:
+    timings: list = []
+    _request_timings.set(timings)
+    return timings
+
+
+def record(stage: str, seconds: float, provider: str = "", cache: str = "") -> None:
+    STAGE_SECONDS.labels(stage=stage, provider=provider, cache=cache).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds, provider or cache))
+
+
+@contextmanager
+def stage(name: str, provider: str = "", cache: str = ""):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started, provider=provider, cache=cache)
+
+
+def record_compression(ratio: float) -> None:
+    COMPRESSION_RATIO.observe(ratio)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append(("compression_ratio", None, f"{ratio:.3f}"))
+
+
+def record_admission(stage: str, outcome: str) -> None:
+    ADMISSIONS.labels(stage=stage, outcome=outcome).inc()
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def server_timing_header(timings: list, total: float | None = None) -> str:
+    entries = []
+    for name, seconds, desc in timings:
+        entry = name if seconds is None else f"{name};dur={seconds * 1000:.1f}"
+        if desc:
+            entry += f';desc="{desc}"'
+        entries.append(entry)
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def log_payload(kind: str, text: str) -> None:
+    """Log a (truncated) payload for a sampled fraction of calls."""
+    if LOG_PAYLOAD_SAMPLE_RATE <= 0 or random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    logger.info("%s (%d chars): %s", kind, len(text), text[:LOG_PAYLOAD_MAX_CHARS])
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware that adds the request's stage timings as a Server-Timing header.
+
+    Streaming responses only report the stages finished before the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = start_request_timings()
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                header = server_timing_header(timings, total=time.perf_counter() - started)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode("latin-1"))
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import os
+from collections import deque
+from typing import NamedTuple
+
+import httpx
+from prometheus_client import Histogram
+
+# Route table for summaries, as JSON: a list of
+#   {"name", "model", "max_input_tokens", "max_tokens", "chunk_tokens", "timeout"}
+# A transcript takes the first route whose max_input_tokens (null = any size)
+# fits its estimated token count, and falls back to the routes after it.
+# Longer input than a route's chunk_tokens goes through the map step.
+SUMMARY_ROUTES = os.environ.get("SUMMARY_ROUTES", "")
+# Models of the built-in table; the middle tiers use SUMMARY_MODEL.
+SUMMARY_SMALL_MODEL = os.environ.get("SUMMARY_SMALL_MODEL", "meta-llama/Llama-3.2-3B-Instruct-Turbo")
+SUMMARY_LONG_MODEL = os.environ.get("SUMMARY_LONG_MODEL", "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo")
+SHORT_ROUTE_TOKENS = int(os.environ.get("SHORT_ROUTE_TOKENS", "1500"))
+# The long-context tier's model takes 128k tokens; leave room for the prompt and output.
+LONG_ROUTE_TOKENS = int(os.environ.get("LONG_ROUTE_TOKENS", "100000"))
+ROUTE_STATS_WINDOW = int(os.environ.get("ROUTE_STATS_WINDOW", "200"))
+# Upstream answers that mean "try another model" rather than "this request is bad".
+FALLBACK_STATUS = (429, 503)
+
+ROUTE_SECONDS = Histogram(
+    "summary_route_seconds",
+    "Time per summary attempt on each model route, by outcome.",
+    ["route", "outcome"],
+    buckets=(0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60, 120),
+)
+ROUTE_INPUT_TOKENS = Histogram(
+    "summary_route_input_tokens",
+    "Estimated transcript tokens sent down each model route.",
+    ["route"],
+    buckets=(250, 500, 1000, 1500, 2500, 4000, 6000, 10000, 25000, 50000, 100000, 250000),
+)
+
+
+class Route(NamedTuple):
+    name: str
+    model: str
+    max_input_tokens: int | None
+    max_tokens: int
+    chunk_tokens: int
+    timeout: float | None
+
+
+def default_routes(model: str, max_tokens: int, chunk_tokens: int) -> list[Route]:
+    return [
+        Route("short", SUMMARY_SMALL_MODEL, SHORT_ROUTE_TOKENS, min(max_tokens, 256), chunk_tokens, 20),
+        Route("standard", model, chunk_tokens, max_tokens, chunk_tokens, 60),
+        Route("long", SUMMARY_LONG_MODEL, LONG_ROUTE_TOKENS, max_tokens, LONG_ROUTE_TOKENS, 120),
+        Route("chunked", model, None, max_tokens, chunk_tokens, 180),
+    ]
+
+
+def load_routes(model: str, max_tokens: int, chunk_tokens: int) -> list[Route]:
+    """Routes from SUMMARY_ROUTES, or the built-in table when unset or invalid."""
+    if not SUMMARY_ROUTES:
+        return default_routes(model, max_tokens, chunk_tokens)
+    try:
+        routes = [
+            Route(
+                name=entry["name"],
+                model=entry.get("model", model),
+                max_input_tokens=entry.get("max_input_tokens"),
+                max_tokens=int(entry.get("max_tokens", max_tokens)),
+                chunk_tokens=int(entry.get("chunk_tokens", chunk_tokens)),
+                timeout=entry.get("timeout"),
+            )
+            for entry in json.loads(SUMMARY_ROUTES)
+        ]
+    except (ValueError, TypeError, KeyError) as e:
+        print(f"[model_router] invalid SUMMARY_ROUTES ({e!r}); using the built-in routes")
+        return default_routes(model, max_tokens, chunk_tokens)
+    return routes or default_routes(model, max_tokens, chunk_tokens)
+
+
+class RouteStats:
+    """Rolling outcomes, latency and input size over the last ``window`` attempts."""
+
+    def __init__(self, window: int):
+        self.samples: deque[tuple[str, float, int]] = deque(maxlen=window)
+
+    def record(self, outcome: str, seconds: float, tokens: int) -> None:
+        self.samples.append((outcome, seconds, tokens))
+
+    def snapshot(self) -> dict:
+        def quantile(values: list[float], q: float):
+            if not values:
+                return None
+            ordered = sorted(values)
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+        ok = [seconds for outcome, seconds, _ in self.samples if outcome == "ok"]
+        tokens = [t for _, _, t in self.samples]
+        return {
+            "calls": len(self.samples),
+            "ok": len(ok),
+            "fallbacks": sum(1 for outcome, _, _ in self.samples if outcome == "fallback"),
+            "errors": sum(1 for outcome, _, _ in self.samples if outcome == "error"),
+            "p50": quantile(ok, 0.5),
+            "p90": quantile(ok, 0.9),
+            "input_tokens_p50": quantile(tokens, 0.5),
+            "input_tokens_max": max(tokens) if tokens else None,
+        }
+
+
+class ModelRouter:
+    def __init__(self, routes: list[Route]):
+        self.routes = routes
+        self._stats = {route.name: RouteStats(ROUTE_STATS_WINDOW) for route in routes}
+
+    def plan(self, tokens: int) -> list[Route]:
+        """The route for ``tokens`` input tokens followed by its fallbacks."""
+        for i, route in enumerate(self.routes):
+            if route.max_input_tokens is None or tokens <= route.max_input_tokens:
+                return self.routes[i:]
+        return self.routes[-1:]
+
+    @staticmethod
+    def should_fall_back(error: BaseException) -> bool:
+        if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)):
+            return True
+        return (isinstance(error, httpx.HTTPStatusError)
+                and error.response.status_code in FALLBACK_STATUS)
+
+    def observe(self, route: Route, tokens: int, seconds: float, outcome: str) -> None:
+        ROUTE_SECONDS.labels(route=route.name, outcome=outcome).observe(seconds)
+        ROUTE_INPUT_TOKENS.labels(route=route.name).observe(tokens)
+        stats = self._stats.get(route.name)
+        if stats is not None:
+            stats.record(outcome, seconds, tokens)
+
+    def stats(self) -> dict:
+        return {
+            route.name: {**route._asdict(), **self._stats[route.name].snapshot()}
+            for route in self.routes
+        }
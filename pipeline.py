@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+from fastapi import HTTPException
+
+from admission import mark_cache_hit, transcript_gate
+from metrics import cache_lookup, record
+from segment_store import SegmentStore
+from single_flight import SingleFlight
+from transcript_cache import MISSING, transcript_cache
+from transcript_providers import TranscriptUnavailable, fetch_transcript
+
+transcript_flight = SingleFlight()
+
+
+async def load_transcript(video_id: str, video_url: str) -> SegmentStore | None:
+    """Cached transcript lookup; concurrent misses for one video share a fetch.
+
+    Returns the timestamped segments; ``.text`` is the whole transcript.
+    """
+    started = time.perf_counter()
+    transcript = await asyncio.to_thread(transcript_cache.get, video_id)
+    cache_lookup("transcript", transcript is not MISSING)
+    if transcript is not MISSING:
+        record("transcript", time.perf_counter() - started, cache="hit")
+        mark_cache_hit()
+        return transcript
+
+    if not transcript_flight.running(video_id):
+        # a request joining a fetch in flight does not need a slot of its own
+        transcript_gate.check()
+
+    async def fetch():
+        try:
+            async with transcript_gate.admit():
+                transcript, provider = await fetch_transcript(video_url, video_id)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Timed out fetching the transcript.")
+        except TranscriptUnavailable as e:
+            print(e)
+            raise HTTPException(status_code=502, detail="Failed to fetch the transcript.")
+        # a None result means "no captions" and is cached for a shorter TTL
+        await asyncio.to_thread(transcript_cache.set, video_id, transcript)
+        return transcript
+
+    try:
+        return await transcript_flight.do(video_id, fetch)
+    finally:
+        record("transcript", time.perf_counter() - started, cache="miss")
+
+
+def select_range(transcript: SegmentStore, start: float | None, end: float | None,
+                 needs_timing: bool = False) -> SegmentStore:
+    """The part of the transcript between ``start`` and ``end`` seconds."""
+    if start is None and end is None and not needs_timing:
+        return transcript
+    if not transcript.timed:
+        raise HTTPException(status_code=422, detail="This transcript has no timestamps.")
+    return transcript.slice(start, end)
@@ -0,0 +1,216 @@
+import asyncio
+import os
+import time
+
+from fastapi import HTTPException
+
+from admission import llm_gate, transcript_gate
+from caption_parser import CaptionParser, segments_to_text
+from chunking import estimate_tokens
+from get_transcript_variations import YOUTUBE_TIMEDTEXT_URL
+from http_clients import get_async_client
+from metrics import record
+from segment_store import SegmentStore
+from single_flight import SingleFlight
+from summary_cache import SummaryCache, summary_cache
+from transcript_cache import MISSING, transcript_cache
+from transcript_providers import TRANSCRIPT_PROVIDERS
+from upstream_guard import youtube
+from video_processing import (
+    CHUNK_PROMPT,
+    REDUCE_PROMPT_SUFFIX,
+    SUMMARY_CHUNK_MAX_TOKENS,
+    SUMMARY_CHUNK_OVERLAP,
+    SUMMARY_CHUNK_TOKENS,
+    SUMMARY_CONCURRENCY,
+    SUMMARY_PROMPT,
+    SummaryFailed,
+    _complete_routed,
+    join_parts,
+    route_plan,
+    summarize_video,
+)
+
+# With SUMMARY_PIPELINE=1, /summary streams the captions of an uncached video
+# from the timedtext endpoint and starts summarizing chunks of
+# PIPELINE_CHUNK_TOKENS while the rest is still downloading; the partial
+# summaries are merged once the last chunk is done. Off when the timedtext
+# provider is not enabled, since that is the endpoint being streamed.
+SUMMARY_PIPELINE = os.environ.get("SUMMARY_PIPELINE", "0") == "1" and (
+    not TRANSCRIPT_PROVIDERS or "timedtext" in TRANSCRIPT_PROVIDERS)
+PIPELINE_CHUNK_TOKENS = int(os.environ.get("PIPELINE_CHUNK_TOKENS", str(SUMMARY_CHUNK_TOKENS)))
+
+pipeline_flight = SingleFlight()
+
+_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
+
+
+class _ChunkMap:
+    """Summarizes transcript chunks as segments arrive, ``overlap`` tokens apart.
+
+    The first chunk starts a task that waits for an LLM admission slot and
+    holds it until ``close``, so a pipelined summary costs one slot like any
+    other. The download never waits on the LLM queue itself; chunk summaries
+    wait for the slot instead. Each chunk is routed by size and falls back
+    like any summary (model_router).
+    """
+
+    def __init__(self, chunk_tokens: int, overlap: int):
+        self.chunk_tokens = chunk_tokens
+        self.overlap = overlap
+        self.pending: list = []
+        self.pending_tokens = 0
+        self.fresh = 0  # segments not in any dispatched chunk yet
+        self.tasks: list[asyncio.Task] = []
+        self.semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+        self.slot: asyncio.Future | None = None
+        self._holder: asyncio.Task | None = None
+        self._done = asyncio.Event()
+
+    def add(self, segments) -> None:
+        for segment in segments:
+            tokens = estimate_tokens(segment.text) + 1
+            if self.fresh and self.pending_tokens + tokens > self.chunk_tokens:
+                self._dispatch()
+            self.pending.append(segment)
+            self.pending_tokens += tokens
+            self.fresh += 1
+
+    def _dispatch(self) -> None:
+        if self._holder is None:
+            self.slot = asyncio.get_running_loop().create_future()
+            self._holder = asyncio.create_task(self._hold_slot())
+        text = segments_to_text(self.pending)
+        self.tasks.append(asyncio.create_task(self._summarize(text)))
+        # carry the tail over so a point made across the boundary is not cut in half
+        tail, tokens = [], 0
+        for segment in reversed(self.pending):
+            tokens += estimate_tokens(segment.text) + 1
+            if tokens > self.overlap:
+                break
+            tail.append(segment)
+        self.pending = tail[::-1]
+        self.fresh = 0
+        self.pending_tokens = sum(estimate_tokens(s.text) + 1 for s in self.pending)
+
+    async def _hold_slot(self) -> None:
+        try:
+            async with llm_gate.admit("pipelined"):
+                self.slot.set_result(None)
+                await self._done.wait()
+        except BaseException as e:
+            if not self.slot.done():
+                if isinstance(e, asyncio.CancelledError):
+                    self.slot.cancel()
+                else:
+                    self.slot.set_exception(e)
+            raise
+
+    async def _summarize(self, chunk: str) -> str:
+        await asyncio.shield(self.slot)
+        async with self.semaphore:
+            plan = route_plan(chunk, max_tokens=SUMMARY_CHUNK_MAX_TOKENS)
+            return await _complete_routed(chunk, plan, CHUNK_PROMPT)
+
+    async def finish(self) -> list[str]:
+        if self.fresh:
+            self._dispatch()
+        return list(await asyncio.gather(*self.tasks))
+
+    async def close(self) -> None:
+        """Cancel unfinished chunks and give the LLM slot back."""
+        for task in self.tasks:
+            task.cancel()
+        self._done.set()
+        if self._holder is not None:
+            await asyncio.gather(self._holder, *self.tasks, return_exceptions=True)
+
+
+async def _stream_captions(video_id: str, chunks: _ChunkMap) -> list | None:
+    """Feed the timedtext captions to ``chunks`` as they download; all segments, or None."""
+    probe = await asyncio.to_thread(youtube.before)
+    parser = CaptionParser()
+    segments = []
+    try:
+        async with get_async_client().stream(
+            "GET", YOUTUBE_TIMEDTEXT_URL, headers=_HEADERS,
+            params={"v": video_id, "lang": "en", "fmt": "srv3"},
+        ) as response:
+            if response.status_code != 200:
+                youtube.record_status(response.status_code)
+                return None
+            async for data in response.aiter_text():
+                new = parser.feed(data)
+                segments.extend(new)
+                chunks.add(new)
+        youtube.record_status(response.status_code)
+        new = parser.close()
+    except ValueError as e:
+        # the body arrived but is not captions; says nothing about YouTube's health
+        print(f"[pipelined] unparseable captions for {video_id!r}: {e}")
+        return None
+    except Exception as e:
+        youtube.record_error(e)
+        raise
+    finally:
+        youtube.after(probe)
+    segments.extend(new)
+    chunks.add(new)
+    return segments
+
+
+async def _run(video_id: str) -> str | None:
+    started = time.perf_counter()
+    chunks = _ChunkMap(PIPELINE_CHUNK_TOKENS, SUMMARY_CHUNK_OVERLAP)
+    try:
+        async with transcript_gate.admit():
+            segments = await _stream_captions(video_id, chunks)
+        store = SegmentStore.from_segments(segments or [])
+        if not store:
+            return None
+        record("caption_download", time.perf_counter() - started, provider="pipelined")
+        await asyncio.to_thread(transcript_cache.set, video_id, store)
+        if not chunks.tasks:
+            # fits in one chunk: nothing to overlap, summarize as usual
+            return await summarize_video(store.text)
+        try:
+            partials = await chunks.finish()
+            print(f"[pipelined] {video_id}: {len(partials)} chunks summarized,"
+                  f" {time.perf_counter() - started:.2f}s after the download started")
+            # the reduce takes the whole transcript's route, as the sequential
+            # path's final call does, so model and output budget match its key
+            plan = route_plan(store.text)
+            summary = await _complete_routed(join_parts(partials), plan,
+                                             SUMMARY_PROMPT + REDUCE_PROMPT_SUFFIX)
+        except HTTPException:
+            raise
+        except Exception as e:
+            # every route failed; starting over on the sequential path would
+            # only hit the same models again
+            print(f"[pipelined] {video_id}: summary failed: {e!r}")
+            raise SummaryFailed() from e
+    finally:
+        await chunks.close()
+    # stored where summarize_video would look for this transcript's summary
+    summary_cache.set(SummaryCache.key(store.text, plan[0].model, SUMMARY_PROMPT,
+                                       plan[0].max_tokens), summary)
+    return summary
+
+
+async def pipelined_summary(video_id: str) -> str | None:
+    """Summary of an uncached video with download, parsing and the map step overlapped.
+
+    Returns None when the transcript is already cached or the direct
+    timedtext fetch yields nothing or fails, and the caller should take the
+    usual load_transcript + summarize_video path. Raises ``Overloaded`` when
+    shed and ``SummaryFailed`` when the LLM calls failed.
+    """
+    if await asyncio.to_thread(transcript_cache.get, video_id) is not MISSING:
+        return None
+    try:
+        return await pipeline_flight.do(video_id, lambda: _run(video_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[pipelined] {video_id}: {e!r}; falling back to the sequential path")
+        return None
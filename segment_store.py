@@ -0,0 +1,158 @@
+import json
+import re
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+
+from caption_parser import Segment
+
+_MAGIC = b"SEG1"
+_MULTI_SPACE = re.compile(r"\s+")
+_NO_SPACE_BEFORE = ".,!?;:"
+
+
+def _clean_chapters(chapters) -> list[dict]:
+    """yt-dlp ``chapters`` (start_time/end_time/title) -> [{"title", "start", "end"}]."""
+    cleaned = []
+    for chapter in chapters or []:
+        start = chapter.get("start", chapter.get("start_time"))
+        end = chapter.get("end", chapter.get("end_time"))
+        if start is None or end is None or end <= start:
+            continue
+        cleaned.append({"title": chapter.get("title") or "", "start": float(start), "end": float(end)})
+    return cleaned
+
+
+class SegmentStore:
+    """Timestamped transcript segments in parallel arrays plus one text buffer.
+
+    ``starts``/``durations`` hold seconds per segment and ``offsets[i]`` is
+    where segment ``i`` begins in ``text`` (``offsets[-1] == len(text)``), so
+    the full transcript is the buffer itself and any time range is a bisect
+    plus a string slice. ``timed`` is False for transcripts that came without
+    timings (old cache entries, text-only providers).
+    """
+
+    __slots__ = ("starts", "durations", "offsets", "text", "timed", "chapters")
+
+    def __init__(self, starts: array, durations: array, offsets: array, text: str,
+                 timed: bool = True, chapters: list[dict] | None = None):
+        self.starts = starts
+        self.durations = durations
+        self.offsets = offsets
+        self.text = text
+        self.timed = timed
+        self.chapters = chapters or []
+
+    @classmethod
+    def from_segments(cls, segments, chapters=None) -> "SegmentStore":
+        starts, durations, offsets = array("d"), array("d"), array("I")
+        parts: list[str] = []
+        length = 0
+        for segment in segments:
+            text = _MULTI_SPACE.sub(" ", segment.text).strip()
+            if not text:
+                continue
+            if parts and text[0] not in _NO_SPACE_BEFORE:
+                parts.append(" ")
+                length += 1
+            starts.append(segment.start)
+            durations.append(segment.duration)
+            offsets.append(length)
+            parts.append(text)
+            length += len(text)
+        offsets.append(length)
+        return cls(starts, durations, offsets, "".join(parts), chapters=_clean_chapters(chapters))
+
+    @classmethod
+    def from_text(cls, text: str) -> "SegmentStore":
+        """A single untimed segment, for transcripts that arrive as plain text."""
+        text = text.strip()
+        if not text:
+            return cls(array("d"), array("d"), array("I", [0]), "", timed=False)
+        return cls(array("d", [0.0]), array("d", [0.0]), array("I", [0, len(text)]), text,
+                   timed=False)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __bool__(self) -> bool:
+        return bool(self.text)
+
+    def __getitem__(self, i: int) -> Segment:
+        if i < 0:
+            i += len(self)
+        return Segment(self.starts[i], self.durations[i],
+                       self.text[self.offsets[i]:self.offsets[i + 1]].strip())
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def duration(self) -> float:
+        """End time of the last segment."""
+        if not self.starts:
+            return 0.0
+        return self.starts[-1] + self.durations[-1]
+
+    def _bounds(self, start: float | None, end: float | None) -> tuple[int, int]:
+        # segments overlapping [start, end)
+        i = 0
+        if start is not None:
+            i = max(bisect_right(self.starts, start) - 1, 0)
+            if i < len(self) and self.starts[i] + self.durations[i] <= start:
+                i += 1
+        j = len(self) if end is None else bisect_left(self.starts, end)
+        return i, max(i, j)
+
+    def text_between(self, start: float | None = None, end: float | None = None) -> str:
+        i, j = self._bounds(start, end)
+        return self.text[self.offsets[i]:self.offsets[j]].strip()
+
+    def slice(self, start: float | None = None, end: float | None = None) -> "SegmentStore":
+        """Segments overlapping ``[start, end)`` seconds, with chapters clipped to the range."""
+        i, j = self._bounds(start, end)
+        base, stop = self.offsets[i], self.offsets[j]
+        if stop > base and self.text[stop - 1] == " ":
+            stop -= 1  # the separator in front of segment j
+        offsets = array("I", (offset - base for offset in self.offsets[i:j]))
+        offsets.append(stop - base)
+        lo = float("-inf") if start is None else start
+        hi = float("inf") if end is None else end
+        chapters = [
+            {**c, "start": max(c["start"], lo), "end": min(c["end"], hi)}
+            for c in self.chapters if c["end"] > lo and c["start"] < hi
+        ]
+        return SegmentStore(self.starts[i:j], self.durations[i:j], offsets,
+                            self.text[base:stop], self.timed, chapters)
+
+    # -- serialization --------------------------------------------------------
+
+    def to_bytes(self) -> bytes:
+        header = json.dumps({"n": len(self), "timed": self.timed,
+                             "chapters": self.chapters}).encode("utf-8")
+        return b"".join((
+            _MAGIC, struct.pack("<I", len(header)), header,
+            self.starts.tobytes(), self.durations.tobytes(), self.offsets.tobytes(),
+            self.text.encode("utf-8"),
+        ))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SegmentStore":
+        """Inverse of ``to_bytes``; plain UTF-8 text (older payloads) loads untimed."""
+        if not data.startswith(_MAGIC):
+            return cls.from_text(data.decode("utf-8"))
+        pos = len(_MAGIC)
+        (header_len,) = struct.unpack_from("<I", data, pos)
+        pos += 4
+        header = json.loads(data[pos:pos + header_len])
+        pos += header_len
+        n = header["n"]
+        arrays = []
+        for typecode, count in (("d", n), ("d", n), ("I", n + 1)):
+            values = array(typecode)
+            size = values.itemsize * count
+            values.frombytes(data[pos:pos + size])
+            arrays.append(values)
+            pos += size
+        return cls(*arrays, data[pos:].decode("utf-8"), header["timed"], header["chapters"])
@@ -0,0 +1,60 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class SummaryCache:
+    """Bounded LRU of finished summaries.
+
+    Keys are derived from a hash of the transcript plus every request
+    parameter that changes the model output, so a prompt or model change
+    never serves a stale summary.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(transcript: str, model: str, prompt: str, max_tokens: int) -> str:
+        h = hashlib.sha256()
+        for part in (transcript, model, prompt, str(max_tokens)):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            summary = self._entries.get(key)
+            if summary is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return summary
+
+    def set(self, key: str, summary: str) -> None:
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+summary_cache = SummaryCache(
+    max_entries=int(os.environ.get("SUMMARY_CACHE_SIZE", "512")),
+)
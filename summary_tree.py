@@ -0,0 +1,211 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from admission import llm_gate
+from chunking import chunk_transcript, estimate_tokens
+from metrics import cache_lookup
+from summary_cache import SummaryCache
+from video_processing import (
+    SUMMARY_CHUNK_MAX_TOKENS,
+    SUMMARY_CHUNK_OVERLAP,
+    SUMMARY_CHUNK_TOKENS,
+    SUMMARY_CONCURRENCY,
+    SUMMARY_MODEL,
+    chat_completion,
+    join_parts,
+    summary_flight,
+    summary_messages,
+)
+
+SUMMARY_TREE_DB = os.environ.get("SUMMARY_TREE_DB", ".cache/summary_tree.sqlite3")
+SUMMARY_TREE_MAX_NODES = int(os.environ.get("SUMMARY_TREE_MAX_NODES", "200000"))
+# Transcript tokens under one segment-level node, and nodes merged per section.
+TREE_SEGMENT_TOKENS = int(os.environ.get("TREE_SEGMENT_TOKENS", "1500"))
+TREE_FANOUT = int(os.environ.get("TREE_FANOUT", "4"))
+
+SEGMENT_PROMPT = (
+    "You are an assistant summarizing one part of a longer video transcript. "
+    "Summarize this part in a few sentences, keeping key points, names, "
+    "numbers and conclusions. Do not add an introduction."
+)
+SECTION_PROMPT = (
+    "You are given summaries of consecutive parts of one section of a video. "
+    "Merge them into one short paragraph without repeating yourself."
+)
+SECTION_MAX_TOKENS = 400
+# Whole-video prompts per detail level, with their completion budgets.
+DETAIL_LEVELS = {
+    "brief": (
+        "You are an assistant summarizing a video. Summarize it in exactly one sentence.",
+        80,
+    ),
+    "paragraph": (
+        "You are an assistant summarizing a video. Summarize it in one concise paragraph, "
+        "focusing on the main points.",
+        256,
+    ),
+    "detailed": (
+        "You are an assistant summarizing a video. Write a detailed summary: a short "
+        "overview, then the key points and arguments in the order they come up, "
+        "keeping names, numbers and conclusions.",
+        1024,
+    ),
+}
+_PARTS_NOTE = (
+    " The input may consist of summaries of consecutive parts of the video; "
+    "treat them as one continuous video."
+)
+
+
+class SummaryTreeStore:
+    """Summary nodes keyed by content hash: a memory LRU in front of SQLite.
+
+    Keys cover the node's input text, model, level, prompt and token budget,
+    so entries never go stale and need no TTL; the oldest are dropped once
+    there are more than ``max_nodes``.
+    """
+
+    def __init__(self, db_path: str | None, max_nodes: int = 200000, memory_entries: int = 2048):
+        self.db_path = db_path
+        self.max_nodes = max_nodes
+        self.memory = SummaryCache(memory_entries)
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if not self.db_path:
+            return None
+        with self._db_lock:
+            if self._db is None:
+                directory = os.path.dirname(self.db_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                db = sqlite3.connect(self.db_path, check_same_thread=False)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS summary_nodes ("
+                    " key TEXT PRIMARY KEY,"
+                    " level TEXT NOT NULL,"
+                    " summary TEXT NOT NULL,"
+                    " created_at REAL NOT NULL)"
+                )
+                db.execute(
+                    "CREATE INDEX IF NOT EXISTS summary_nodes_created_at"
+                    " ON summary_nodes (created_at)"
+                )
+                db.commit()
+                self._db = db
+        return self._db
+
+    def get(self, key: str) -> str | None:
+        summary = self.memory.get(key)
+        if summary is not None:
+            return summary
+        db = self._connect()
+        if db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = db.execute(
+                    "SELECT summary FROM summary_nodes WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"[summary_tree] read failed for {key}: {e}")
+            return None
+        if row is None:
+            return None
+        self.memory.set(key, row[0])
+        return row[0]
+
+    def set(self, key: str, level: str, summary: str) -> None:
+        self.memory.set(key, summary)
+        db = self._connect()
+        if db is None:
+            return
+        try:
+            with self._db_lock:
+                db.execute(
+                    "INSERT OR REPLACE INTO summary_nodes (key, level, summary, created_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, level, summary, time.time()),
+                )
+                self._writes += 1
+                if self._writes % 100 == 0:
+                    db.execute(
+                        "DELETE FROM summary_nodes WHERE key IN (SELECT key FROM summary_nodes"
+                        " ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_nodes,),
+                    )
+                db.commit()
+        except sqlite3.Error as e:
+            print(f"[summary_tree] write failed for {key}: {e}")
+
+    def stats(self) -> dict:
+        return self.memory.stats()
+
+
+summary_tree = SummaryTreeStore(SUMMARY_TREE_DB, SUMMARY_TREE_MAX_NODES)
+
+
+async def summarize_tree(transcript: str, detail: str, model: str = SUMMARY_MODEL) -> dict:
+    """Summary at one ``detail`` level, built from the cached summary tree.
+
+    The transcript is cut into segment nodes, groups of TREE_FANOUT segments
+    are merged into section nodes, and the whole-video node for ``detail``
+    is written from the sections. Every node is looked up by content hash
+    first, so another detail level only costs the root call, and a prompt
+    change at one level rebuilds that level and the ones above it. Returns
+    ``{"summary": ..., "sections": [...]}``; raises on upstream errors, or
+    ``Overloaded`` when admission control sheds the request.
+    """
+    async with llm_gate.admit():
+        return await _summarize_tree(transcript, detail, model)
+
+
+async def _summarize_tree(transcript: str, detail: str, model: str) -> dict:
+    prompt, max_tokens = DETAIL_LEVELS[detail]
+    slots = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+    async def node(level: str, prompt: str, max_tokens: int, content: str) -> str:
+        key = SummaryCache.key(content, model, f"{level}\0{prompt}", max_tokens)
+        cached = await asyncio.to_thread(summary_tree.get, key)
+        cache_lookup("summary_tree", cached is not None)
+        if cached is not None:
+            return cached
+
+        async def build() -> str:
+            async with slots:
+                summary = await chat_completion(model, summary_messages(content, prompt), max_tokens)
+            await asyncio.to_thread(summary_tree.set, key, level, summary)
+            return summary
+
+        return await summary_flight.do(key, build)
+
+    segments = chunk_transcript(transcript, TREE_SEGMENT_TOKENS, SUMMARY_CHUNK_OVERLAP)
+    if len(segments) <= 1:
+        # short video: the whole-video node reads the transcript directly
+        summary = await node("video", prompt, max_tokens, transcript)
+        return {"summary": summary, "sections": []}
+
+    sections = await asyncio.gather(
+        *(node("segment", SEGMENT_PROMPT, SUMMARY_CHUNK_MAX_TOKENS, s) for s in segments)
+    )
+
+    async def merge(nodes: list[str]) -> list[str]:
+        groups = [nodes[i:i + TREE_FANOUT] for i in range(0, len(nodes), TREE_FANOUT)]
+        return await asyncio.gather(
+            *(node("section", SECTION_PROMPT, SECTION_MAX_TOKENS, join_parts(g)) for g in groups)
+        )
+
+    if len(sections) > TREE_FANOUT:
+        sections = await merge(sections)
+    # very long videos fold again until the whole-video input fits one prompt
+    while len(sections) > 1 and estimate_tokens(join_parts(sections)) > SUMMARY_CHUNK_TOKENS:
+        sections = await merge(sections)
+
+    summary = await node("video", prompt + _PARTS_NOTE, max_tokens, join_parts(sections))
+    return {"summary": summary, "sections": list(sections)}
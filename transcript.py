@@ -1,17 +1,23 @@
-import requests
-import yt_dlp
-from youtube_transcript_api import YouTubeTranscriptApi as yta
+from urllib.parse import urljoin
+from caption_parser import captions_to_text, parse_captions
+from get_transcript_variations import _caption_body
+from metrics import stage
+from segment_store import SegmentStore
+from upstream_guard import invidious_pool, youtube
+from ytdlp_pool import borrow, register_profile, resolve
+
+
+register_profile("ytdlp_vtt", {
+    "skip_download": True,
+    "writeautomaticsub": True,
+    "subtitleslangs": ["en"],
+    "subtitlesformat": "vtt",
+})
 
 
 def fetch_transcript_with_ytdlp(video_url: str) -> str:
-    opts = {
-        "skip_download": True,
-        "writeautomaticsub": True,
-        "subtitleslangs": ["en"],
-        "subtitlesformat": "vtt",
-    }
-    with yt_dlp.YoutubeDL(opts) as ydl:
-        info = ydl.extract_info(video_url, download=False)
+    with borrow("ytdlp_vtt") as ydl:
+        info = resolve(ydl, video_url)
 
     # 1) look for automatic captions (old API)
     captions = info.get("automatic_captions", {}).get("en")
@@ -29,16 +35,10 @@ def fetch_transcript_with_ytdlp(video_url: str) -> str:
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36',
     }
-    vtt_data = requests.get(vtt_url, headers=headers).text
+    vtt_data = youtube.get(vtt_url, headers=headers, timeout=10).text
 
     # strip VTT cues → plain text
-    lines = []
-    for line in vtt_data.splitlines():
-        line = line.strip()
-        if not line or "-->" in line or line.isdigit():
-            continue
-        lines.append(line)
-    return " ".join(lines)
+    return captions_to_text(vtt_data)
 
 
 EN_CODES = ["en", "en-US", "en-GB"]
@@ -58,26 +58,31 @@ EN_CODES = ["en", "en-US", "en-GB"]
 
 def english_captions(url: str) -> str:
     # extract the 11-char ID, e.g. “i4b_ETwPoTE”
+    from youtube_transcript_api import YouTubeTranscriptApi as yta
+
     vid = url.split("v=")[-1].split("&")[0].replace("youtu.be/", "")
     text = " ".join(seg["text"] for seg in yta.get_transcript(vid, languages=["en"]))
     return text
 
-def get_auto_cc(video_id: str) -> str | None:
-    # 1) fetch Invidious metadata
-    meta = requests.get(f"https://yewtu.be/api/v1/videos/{video_id}").json()
+def get_auto_cc(video_id: str) -> SegmentStore | None:
+    # 1) fetch Invidious metadata from the fastest healthy instance
+    with stage("metadata", provider="invidious"):
+        instance, response = invidious_pool.get(f"/api/v1/videos/{video_id}", timeout=10)
+    meta = response.json()
     subs = meta.get("subtitles", [])
-    # 2) find the auto‑CC URL
+    # 2) find the auto‑CC URL (Invidious hands out instance-relative paths)
     entry = next((s for s in subs if s["lang"]=="en" and s["kind"]=="asr"), None)
     if not entry:
         return None
-    # 3) download & clean
+    # 3) download & clean, from the same instance
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36',
     }
-    vtt = requests.get(entry["url"], headers=headers).text
-    lines = [
-        line for line in vtt.splitlines()
-        if line and not line[0].isdigit() and "-->" not in line
-    ]
-    return " ".join(lines)
-
+    with stage("caption_download", provider="invidious"):
+        vtt = _caption_body(invidious_pool.upstreams[instance].get(
+            urljoin(instance + "/", entry["url"]), headers=headers, timeout=10
+        ))
+    if vtt is None:
+        return None
+    with stage("parse", provider="invidious"):
+        return SegmentStore.from_segments(parse_captions(vtt, "vtt")) or None
@@ -0,0 +1,218 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from segment_store import SegmentStore
+
+
+# Returned by TranscriptCache.get when nothing usable is cached. A cached
+# ``None`` means "we already know this video has no English captions".
+MISSING = object()
+
+
+class TranscriptCache:
+    """Two-tier transcript cache keyed by YouTube video ID.
+
+    Tier 1 is a bounded in-process LRU, tier 2 is a SQLite file shared by all
+    workers on the host. Transcripts are SegmentStores, kept as compact
+    binary blobs on disk. Entries expire after ``ttl`` seconds (``negative_ttl``
+    for "no captions" results) and the disk tier is trimmed oldest-first once
+    the stored payloads exceed ``max_db_bytes``.
+    """
+
+    def __init__(self, max_entries: int = 256, db_path: str | None = None,
+                 ttl: float = 7 * 24 * 3600, negative_ttl: float = 3600,
+                 max_db_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_db_bytes = max_db_bytes
+
+        self._memory: OrderedDict[str, tuple[float, SegmentStore | None]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    # -- public API ---------------------------------------------------------
+
+    def get(self, video_id: str):
+        """Return the cached transcript, ``None`` for a negative hit, or MISSING."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(video_id)
+            if entry is not None:
+                expires_at, transcript = entry
+                if expires_at > now:
+                    self._memory.move_to_end(video_id)
+                    self.memory_hits += 1
+                    if transcript is None:
+                        self.negative_hits += 1
+                    return transcript
+                del self._memory[video_id]
+
+        entry = self._disk_get(video_id, now)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return MISSING
+
+        expires_at, transcript = entry
+        with self._lock:
+            self.disk_hits += 1
+            if transcript is None:
+                self.negative_hits += 1
+            self._memory_put(video_id, expires_at, transcript)
+        return transcript
+
+    def set(self, video_id: str, transcript: SegmentStore | None) -> None:
+        """Cache a transcript, or ``None`` to remember that no captions exist."""
+        ttl = self.negative_ttl if transcript is None else self.ttl
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._memory_put(video_id, expires_at, transcript)
+        self._disk_set(video_id, expires_at, transcript)
+
+    def invalidate(self, video_id: str) -> None:
+        with self._lock:
+            self._memory.pop(video_id, None)
+        db = self._connect()
+        if db is None:
+            return
+        with self._db_lock:
+            db.execute("DELETE FROM transcripts WHERE video_id = ?", (video_id,))
+            db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+    # -- memory tier --------------------------------------------------------
+
+    def _memory_put(self, video_id: str, expires_at: float,
+                    transcript: SegmentStore | None) -> None:
+        # caller holds self._lock
+        self._memory[video_id] = (expires_at, transcript)
+        self._memory.move_to_end(video_id)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # -- disk tier ----------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if not self.db_path:
+            return None
+        if self._db is None:
+            with self._db_lock:
+                if self._db is None:
+                    directory = os.path.dirname(self.db_path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    db = sqlite3.connect(self.db_path, check_same_thread=False)
+                    db.execute("PRAGMA journal_mode=WAL")
+                    db.execute(
+                        "CREATE TABLE IF NOT EXISTS transcripts ("
+                        " video_id TEXT PRIMARY KEY,"
+                        " payload BLOB,"
+                        " size INTEGER NOT NULL,"
+                        " expires_at REAL NOT NULL,"
+                        " accessed_at REAL NOT NULL)"
+                    )
+                    db.execute(
+                        "CREATE INDEX IF NOT EXISTS transcripts_accessed_at"
+                        " ON transcripts (accessed_at)"
+                    )
+                    db.commit()
+                    self._db = db
+        return self._db
+
+    def _disk_get(self, video_id: str, now: float):
+        db = self._connect()
+        if db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = db.execute(
+                    "SELECT payload, expires_at FROM transcripts WHERE video_id = ?",
+                    (video_id,),
+                ).fetchone()
+                if row is None:
+                    return None
+                payload, expires_at = row
+                if expires_at <= now:
+                    db.execute("DELETE FROM transcripts WHERE video_id = ?", (video_id,))
+                    db.commit()
+                    return None
+                db.execute(
+                    "UPDATE transcripts SET accessed_at = ? WHERE video_id = ?",
+                    (now, video_id),
+                )
+                db.commit()
+        except sqlite3.Error as e:
+            print(f"[transcript_cache] disk read failed for {video_id!r}: {e}")
+            return None
+        transcript = None if payload is None else SegmentStore.from_bytes(zlib.decompress(payload))
+        return expires_at, transcript
+
+    def _disk_set(self, video_id: str, expires_at: float,
+                  transcript: SegmentStore | None) -> None:
+        db = self._connect()
+        if db is None:
+            return
+        payload = None if transcript is None else zlib.compress(transcript.to_bytes())
+        size = len(payload) if payload else 0
+        try:
+            with self._db_lock:
+                db.execute(
+                    "INSERT OR REPLACE INTO transcripts"
+                    " (video_id, payload, size, expires_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (video_id, payload, size, expires_at, time.time()),
+                )
+                self._evict(db)
+                db.commit()
+        except sqlite3.Error as e:
+            print(f"[transcript_cache] disk write failed for {video_id!r}: {e}")
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        # caller holds self._db_lock
+        db.execute("DELETE FROM transcripts WHERE expires_at <= ?", (time.time(),))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+        if total <= self.max_db_bytes:
+            return
+        rows = db.execute(
+            "SELECT video_id, size FROM transcripts ORDER BY accessed_at ASC"
+        ).fetchall()
+        doomed = []
+        for video_id, size in rows:
+            if total <= self.max_db_bytes:
+                break
+            doomed.append((video_id,))
+            total -= size
+        db.executemany("DELETE FROM transcripts WHERE video_id = ?", doomed)
+
+
+transcript_cache = TranscriptCache(
+    max_entries=int(os.environ.get("TRANSCRIPT_CACHE_SIZE", "256")),
+    db_path=os.environ.get("TRANSCRIPT_CACHE_DB", ".cache/transcripts.sqlite3") or None,
+    ttl=float(os.environ.get("TRANSCRIPT_CACHE_TTL", str(7 * 24 * 3600))),
+    negative_ttl=float(os.environ.get("TRANSCRIPT_CACHE_NEGATIVE_TTL", "3600")),
+    max_db_bytes=int(os.environ.get("TRANSCRIPT_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+)
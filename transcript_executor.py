@@ -0,0 +1,58 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+# "thread" (default) or "process". Processes isolate yt-dlp's CPU work from
+# the GIL but cost more memory per worker.
+TRANSCRIPT_EXECUTOR = os.environ.get("TRANSCRIPT_EXECUTOR", "thread")
+TRANSCRIPT_WORKERS = int(os.environ.get("TRANSCRIPT_WORKERS", "8"))
+TRANSCRIPT_TIMEOUT = float(os.environ.get("TRANSCRIPT_TIMEOUT", "60"))
+
+_executor: Executor | None = None
+
+
+def get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if TRANSCRIPT_EXECUTOR == "process":
+            # pulls in multiprocessing; only pay for it when asked to
+            from concurrent.futures import ProcessPoolExecutor
+
+            _executor = ProcessPoolExecutor(max_workers=TRANSCRIPT_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=TRANSCRIPT_WORKERS, thread_name_prefix="transcript"
+            )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def run_in_transcript_pool(fn, *args, timeout: float | None = None):
+    """Run a blocking provider call in the transcript pool without blocking the loop.
+
+    Raises ``asyncio.TimeoutError`` after ``timeout`` seconds (defaults to
+    TRANSCRIPT_TIMEOUT). On timeout or cancellation the call is dropped if it
+    is still queued; a call that already started cannot be interrupted and
+    finishes in the background, its result discarded.
+    """
+    if isinstance(get_executor(), ThreadPoolExecutor):
+        # carry the request context (stage timings) into the worker thread
+        future = get_executor().submit(contextvars.copy_context().run, fn, *args)
+    else:
+        future = get_executor().submit(fn, *args)
+    try:
+        return await asyncio.wait_for(
+            asyncio.wrap_future(future),
+            TRANSCRIPT_TIMEOUT if timeout is None else timeout,
+        )
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        future.cancel()
+        raise
+
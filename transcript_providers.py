@@ -0,0 +1,232 @@
+import asyncio
+import importlib
+import os
+import time
+from collections import deque
+
+from http_clients import get_session
+from get_transcript_variations import (
+    get_english_transcript,
+    get_english_transcript_v1,
+    get_english_transcript_v2,
+    get_english_transcript_v3,
+)
+from transcript import get_auto_cc
+from metrics import logger, record
+from segment_store import SegmentStore
+from transcript_executor import TRANSCRIPT_TIMEOUT, run_in_transcript_pool
+from ytdlp_pool import POOLS, warm_pools
+
+# Start a backup provider once the running ones have been silent this long.
+# Once a provider has history, its own p90 latency is used instead (clamped).
+TRANSCRIPT_HEDGE_DELAY = float(os.environ.get("TRANSCRIPT_HEDGE_DELAY", "4"))
+TRANSCRIPT_HEDGE_MIN_DELAY = float(os.environ.get("TRANSCRIPT_HEDGE_MIN_DELAY", "0.5"))
+# Upper bound on providers racing for one video.
+TRANSCRIPT_HEDGE_MAX = int(os.environ.get("TRANSCRIPT_HEDGE_MAX", "3"))
+PROVIDER_STATS_WINDOW = int(os.environ.get("PROVIDER_STATS_WINDOW", "50"))
+# Below this many samples a provider is ranked by registration order.
+PROVIDER_MIN_SAMPLES = 3
+# Optional comma-separated allow-list of provider names, e.g. "timedtext,invidious".
+TRANSCRIPT_PROVIDERS = [
+    name.strip() for name in os.environ.get("TRANSCRIPT_PROVIDERS", "").split(",") if name.strip()
+]
+
+
+class TranscriptUnavailable(Exception):
+    """Every provider errored, so we cannot tell whether captions exist."""
+
+
+class ProviderStats:
+    """Rolling success rate and latency over the last ``window`` calls."""
+
+    def __init__(self, window: int):
+        self.samples: deque[tuple[bool, float]] = deque(maxlen=window)
+        self.cancelled = 0
+
+    def record(self, ok: bool, latency: float) -> None:
+        self.samples.append((ok, latency))
+
+    @property
+    def success_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for ok, _ in self.samples if ok) / len(self.samples)
+
+    def latency_quantile(self, q: float) -> float | None:
+        latencies = sorted(latency for ok, latency in self.samples if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def expected_cost(self) -> float | None:
+        """Expected seconds to a transcript, penalising unreliable providers."""
+        if len(self.samples) < PROVIDER_MIN_SAMPLES:
+            return None
+        median = self.latency_quantile(0.5)
+        if median is None:
+            return float("inf")
+        return median / max(self.success_rate, 0.05)
+
+    def snapshot(self) -> dict:
+        p50 = self.latency_quantile(0.5)
+        p90 = self.latency_quantile(0.9)
+        return {
+            "calls": len(self.samples),
+            "success_rate": round(self.success_rate, 3),
+            "p50": None if p50 is None else round(p50, 3),
+            "p90": None if p90 is None else round(p90, 3),
+            "cancelled": self.cancelled,
+        }
+
+
+class Provider:
+    def __init__(self, name: str, fn, arg: str = "url", needs: tuple[str, ...] = ()):
+        self.name = name
+        self.fn = fn
+        self.arg = arg  # "url" or "video_id"
+        # heavy libraries the provider imports on first call; see warm_providers
+        self.needs = needs
+        self.stats = ProviderStats(PROVIDER_STATS_WINDOW)
+
+
+PROVIDERS: dict[str, Provider] = {}
+
+
+def register_provider(name: str, fn, arg: str = "url", needs: tuple[str, ...] = ()) -> None:
+    if TRANSCRIPT_PROVIDERS and name not in TRANSCRIPT_PROVIDERS:
+        return
+    PROVIDERS[name] = Provider(name, fn, arg, needs)
+
+
+# Registration order is the ranking used until stats exist; the current
+# production path goes first.
+register_provider("ytdlp_download", get_english_transcript, needs=("yt_dlp",))
+register_provider("transcript_api", get_english_transcript_v1, needs=("youtube_transcript_api",))
+register_provider("ytdlp_urls", get_english_transcript_v2, needs=("yt_dlp",))
+register_provider("timedtext", get_english_transcript_v3)
+register_provider("invidious", get_auto_cc, arg="video_id")
+
+
+def warm_providers() -> None:
+    """Import the libraries the enabled providers need, build the caption session and yt-dlp pools.
+
+    Blocking; lifespan runs it in a background thread so startup does not
+    wait for it. A request that arrives first just imports on demand.
+    """
+    started = time.perf_counter()
+    needs = {module for provider in PROVIDERS.values() for module in provider.needs}
+    for module in sorted(needs):
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            print(f"[transcript_providers] could not import {module}: {e}")
+    get_session()
+    warm_pools([name for name in PROVIDERS if name in POOLS])
+    record("provider_warmup", time.perf_counter() - started)
+    logger.info("provider warm-up (%s) took %.0f ms", ", ".join(sorted(needs)) or "nothing to import",
+                (time.perf_counter() - started) * 1000)
+
+
+def ranked_providers() -> list[Provider]:
+    """Providers ordered by expected cost; untried ones keep registration order."""
+    providers = list(PROVIDERS.values())
+
+    def sort_key(item):
+        index, provider = item
+        cost = provider.stats.expected_cost()
+        # unknown providers sort after proven-fast ones but before proven-bad ones
+        return (TRANSCRIPT_HEDGE_DELAY * (1 + index) if cost is None else cost, index)
+
+    return [p for _, p in sorted(enumerate(providers), key=sort_key)]
+
+
+def _hedge_delay(provider: Provider) -> float:
+    p90 = provider.stats.latency_quantile(0.9)
+    if p90 is None or len(provider.stats.samples) < PROVIDER_MIN_SAMPLES:
+        return TRANSCRIPT_HEDGE_DELAY
+    return min(max(p90, TRANSCRIPT_HEDGE_MIN_DELAY), TRANSCRIPT_HEDGE_DELAY)
+
+
+async def _call_provider(provider: Provider, url: str, video_id: str, deadline: float):
+    arg = video_id if provider.arg == "video_id" else url
+    started = time.monotonic()
+    try:
+        result = await run_in_transcript_pool(
+            provider.fn, arg, timeout=max(deadline - started, 0.01)
+        )
+    except asyncio.CancelledError:
+        provider.stats.cancelled += 1
+        raise
+    except Exception:
+        provider.stats.record(False, time.monotonic() - started)
+        record("provider", time.monotonic() - started, provider=provider.name)
+        raise
+    if isinstance(result, str):
+        result = SegmentStore.from_text(result)
+    ok = isinstance(result, SegmentStore) and bool(result)
+    provider.stats.record(ok, time.monotonic() - started)
+    record("provider", time.monotonic() - started, provider=provider.name)
+    return result if ok else None
+
+
+async def fetch_transcript(url: str, video_id: str,
+                           timeout: float | None = None) -> tuple[SegmentStore | None, str | None]:
+    """Race the registered providers for one video.
+
+    The historically best provider starts first. A backup is launched when
+    it fails, or when nothing has finished within the hedge delay, up to
+    TRANSCRIPT_HEDGE_MAX running at once. The first valid transcript wins and
+    the rest are cancelled. Returns ``(transcript, provider_name)``, or
+    ``(None, None)`` when providers reported no captions; raises
+    TranscriptUnavailable if every provider errored.
+    """
+    deadline = time.monotonic() + (TRANSCRIPT_TIMEOUT if timeout is None else timeout)
+    queue = ranked_providers()
+    running: dict[asyncio.Task, Provider] = {}
+    saw_empty = False
+    last_error: BaseException | None = None
+
+    def launch_next() -> None:
+        if queue and len(running) < TRANSCRIPT_HEDGE_MAX:
+            provider = queue.pop(0)
+            task = asyncio.ensure_future(_call_provider(provider, url, video_id, deadline))
+            running[task] = provider
+
+    launch_next()
+    try:
+        while running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            leader = next(iter(running.values()))
+            done, _ = await asyncio.wait(
+                running, timeout=min(_hedge_delay(leader), remaining),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                launch_next()
+                continue
+            for task in done:
+                provider = running.pop(task)
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    print(f"[transcript_providers] {provider.name} failed: {last_error!r}")
+                    continue
+                transcript = task.result()
+                if transcript:
+                    return transcript, provider.name
+                saw_empty = True
+            launch_next()
+    finally:
+        for task in running:
+            task.cancel()
+
+    if saw_empty:
+        return None, None
+    raise TranscriptUnavailable(f"all transcript providers failed: {last_error!r}")
+
+
+def provider_stats() -> dict:
+    return {
+        provider.name: provider.stats.snapshot() for provider in ranked_providers()
+    }
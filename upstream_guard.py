@@ -0,0 +1,344 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from http_clients import get_async_client, get_session
+
+YOUTUBE_RATE = float(os.environ.get("YOUTUBE_RATE", "5"))        # requests/second
+YOUTUBE_BURST = float(os.environ.get("YOUTUBE_BURST", "10"))
+INVIDIOUS_RATE = float(os.environ.get("INVIDIOUS_RATE", "2"))    # per instance
+INVIDIOUS_BURST = float(os.environ.get("INVIDIOUS_BURST", "5"))
+# Longest a caller waits for a token before giving up on the upstream.
+RATE_LIMIT_MAX_WAIT = float(os.environ.get("RATE_LIMIT_MAX_WAIT", "10"))
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("BREAKER_RESET_SECONDS", "30"))
+INVIDIOUS_HEALTH_INTERVAL = float(os.environ.get("INVIDIOUS_HEALTH_INTERVAL", "60"))
+# Instances tried per request before giving up on Invidious.
+INVIDIOUS_ATTEMPTS = int(os.environ.get("INVIDIOUS_ATTEMPTS", "2"))
+
+INVIDIOUS_INSTANCES = [
+    url.strip().rstrip("/")
+    for url in os.environ.get("INVIDIOUS_INSTANCES", "").split(",")
+    if url.strip()
+] or [
+    "https://yewtu.be",
+    "https://yewtu.eu",
+    "https://yewtu.kavin.rocks",
+    "https://yewtu.snopyta.org",
+    "https://yewtu.imy.at",
+    "https://yewtu.cloud",
+]
+
+_THROTTLE_MARKERS = ("429", "403", "Too Many Requests", "Forbidden", "blocking requests")
+
+
+class UpstreamUnavailable(Exception):
+    """The upstream is throttling us or its breaker is open; try elsewhere."""
+
+
+class CircuitOpen(UpstreamUnavailable):
+    pass
+
+
+class RateLimited(UpstreamUnavailable):
+    pass
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose rate adapts AIMD-style.
+
+    ``throttled`` halves the refill rate (down to ``min_rate``) when the
+    upstream answers 429/403; every success adds a little back until
+    ``max_rate`` is reached again.
+    """
+
+    def __init__(self, rate: float, burst: float, min_rate: float | None = None):
+        self.max_rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, max_wait: float = RATE_LIMIT_MAX_WAIT) -> None:
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                raise RateLimited(f"no token within {max_wait}s")
+            time.sleep(wait)
+
+    def throttled(self) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            # drain what is left so the back-off applies immediately
+            self.tokens = min(self.tokens, 0)
+
+    def succeeded(self) -> None:
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class CircuitBreaker:
+    """Opens after ``failures`` consecutive failures, half-opens after ``reset_seconds``."""
+
+    def __init__(self, failures: int = BREAKER_FAILURES,
+                 reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = failures
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> str | None:
+        """"closed" or "probe" when a call may go through, None when it may not."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return "closed"
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True  # let exactly one probe through
+                return "probe"
+            return None
+
+    def end_trial(self) -> None:
+        """Free the half-open probe slot without a verdict on the upstream."""
+        with self._lock:
+            self._trial_running = False
+
+    def succeeded(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def failed(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class Upstream:
+    """Rate limiter and circuit breaker for one upstream host."""
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker()
+
+    def before(self) -> bool:
+        """Pass the breaker and take a rate token; True if this call is the half-open probe.
+
+        A probe must end with ``after``, so that an outcome which says nothing
+        about the upstream (or no outcome at all) does not keep the breaker
+        waiting for a verdict forever.
+        """
+        verdict = self.breaker.allow()
+        if verdict is None:
+            raise CircuitOpen(f"{self.name}: circuit open")
+        probe = verdict == "probe"
+        try:
+            self.bucket.acquire()
+        except RateLimited:
+            if probe:
+                self.breaker.end_trial()
+            raise
+        return probe
+
+    def after(self, probe: bool) -> None:
+        if probe:
+            self.breaker.end_trial()
+
+    def record_status(self, status_code: int) -> None:
+        if status_code in (403, 429):
+            self.bucket.throttled()
+            self.breaker.failed()
+        elif status_code >= 500:
+            self.breaker.failed()
+        else:
+            self.bucket.succeeded()
+            self.breaker.succeeded()
+
+    def record_error(self, error: BaseException) -> None:
+        message = str(error)
+        if any(marker in message for marker in _THROTTLE_MARKERS):
+            self.bucket.throttled()
+            self.breaker.failed()
+        elif isinstance(error, OSError) or "timed out" in message.lower():
+            self.breaker.failed()
+        # anything else (no captions, private video, ...) says nothing about
+        # the upstream's health
+
+    @contextmanager
+    def guard(self):
+        """Wrap a call whose failures surface as exceptions (e.g. yt-dlp)."""
+        probe = self.before()
+        try:
+            yield self
+        except Exception as e:
+            self.record_error(e)
+            raise
+        else:
+            self.bucket.succeeded()
+            self.breaker.succeeded()
+        finally:
+            self.after(probe)
+
+    def get(self, url: str, **kwargs):
+        """``get_session().get`` behind this upstream's limiter and breaker."""
+        probe = self.before()
+        try:
+            response = get_session().get(url, **kwargs)
+        except Exception as e:
+            self.record_error(e)
+            raise
+        else:
+            self.record_status(response.status_code)
+        finally:
+            self.after(probe)
+        return response
+
+    def snapshot(self) -> dict:
+        return {
+            "rate": round(self.bucket.rate, 3),
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+        }
+
+
+youtube = Upstream("youtube", YOUTUBE_RATE, YOUTUBE_BURST)
+
+
+class InvidiousPool:
+    """Invidious instances, health-checked in the background, fastest healthy first."""
+
+    def __init__(self, instances: list[str]):
+        self.upstreams = {url: Upstream(url, INVIDIOUS_RATE, INVIDIOUS_BURST) for url in instances}
+        self.latency: dict[str, float | None] = {url: None for url in instances}
+        self.healthy: dict[str, bool] = {url: True for url in instances}
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+
+    def ranked(self) -> list[str]:
+        """Instances whose breaker is not open: healthy before unhealthy, then fastest first.
+
+        Unmeasured instances keep their configured order after measured ones.
+        """
+        with self._lock:
+            order = list(self.upstreams)
+            candidates = [url for url in order if self.upstreams[url].breaker.state != "open"]
+            latency = dict(self.latency)
+            healthy = dict(self.healthy)
+        return sorted(
+            candidates,
+            key=lambda url: (not healthy[url], latency[url] is None, latency[url] or 0.0,
+                             order.index(url)),
+        )
+
+    def get(self, path: str, attempts: int = INVIDIOUS_ATTEMPTS, **kwargs):
+        """GET ``path`` from the best instance, failing over to the next ones.
+
+        Returns ``(instance_url, response)``; raises UpstreamUnavailable when
+        every instance tried was down or throttling.
+        """
+        last_error: Exception | None = None
+        for base in self.ranked()[:attempts]:
+            try:
+                response = self.upstreams[base].get(f"{base}{path}", **kwargs)
+            except UpstreamUnavailable as e:
+                last_error = e
+                continue
+            except Exception as e:
+                self.observe(base, False)
+                last_error = e
+                continue
+            if response.status_code in (403, 429) or response.status_code >= 500:
+                self.observe(base, False)
+                last_error = UpstreamUnavailable(f"{base}: HTTP {response.status_code}")
+                continue
+            return base, response
+        raise UpstreamUnavailable(f"no usable Invidious instance: {last_error!r}")
+
+    def observe(self, url: str, ok: bool, seconds: float | None = None) -> None:
+        with self._lock:
+            self.healthy[url] = ok
+            if ok and seconds is not None:
+                previous = self.latency[url]
+                # EWMA so one slow probe does not reorder the pool
+                self.latency[url] = seconds if previous is None else 0.7 * previous + 0.3 * seconds
+
+    async def check(self) -> None:
+        client = get_async_client()
+
+        async def probe(url: str) -> None:
+            started = time.perf_counter()
+            try:
+                response = await client.get(f"{url}/api/v1/stats", timeout=5.0)
+                self.observe(url, response.status_code == 200, time.perf_counter() - started)
+            except Exception:
+                self.observe(url, False)
+
+        await asyncio.gather(*(probe(url) for url in self.upstreams))
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                print(f"[upstream_guard] Invidious health check failed: {e!r}")
+            await asyncio.sleep(INVIDIOUS_HEALTH_INTERVAL)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latency = dict(self.latency)
+            healthy = dict(self.healthy)
+        return {
+            url: {
+                **upstream.snapshot(),
+                "healthy": healthy[url],
+                "latency": None if latency[url] is None else round(latency[url], 3),
+            }
+            for url, upstream in self.upstreams.items()
+        }
+
+
+invidious_pool = InvidiousPool(INVIDIOUS_INSTANCES)
+
+
+def upstream_stats() -> dict:
+    return {"youtube": youtube.snapshot(), "invidious": invidious_pool.snapshot()}
@@ -1,10 +1,20 @@
+import asyncio
+import json
 import os
+import time
 import traceback
 import httpx
-import requests
 from urllib.parse import urlparse, parse_qs
-from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled
 from dotenv import load_dotenv
+from fastapi import HTTPException
+from admission import llm_gate
+from http_clients import get_async_client
+from metrics import cache_lookup, stage
+from chunking import chunk_transcript, estimate_tokens
+from compression import SUMMARY_COMPRESSION_TOKENS, compress_for_summary, compression_enabled
+from model_router import ModelRouter, Route, load_routes
+from single_flight import SingleFlight
+from summary_cache import SummaryCache, summary_cache
 
 load_dotenv()
 
@@ -28,6 +38,8 @@ def get_video_id(video_url: str) -> str | None:
 
 def safe_transcript(video_id: str) -> str | None:
     """Try multiple ways to obtain an English transcript for a video ID."""
+    from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled
+
     try:
         # Prefer auto-generated English transcript if available
         transcripts = YouTubeTranscriptApi.list_transcripts(video_id)
@@ -56,45 +68,285 @@ def get_transcript(video_url: str) -> str:
     return transcript_text
 
 
-async def summarize_video(transcript: str) -> str:
-    """Generate summary using Together AI chat completions API."""
-    TOGETHER_AI_API_KEY = os.environ["TOGETHER_AI_API_KEY"]
+TOGETHER_API_BASE = os.environ.get("TOGETHER_API_BASE", "https://api.together.xyz/v1")
+TOGETHER_CHAT_URL = f"{TOGETHER_API_BASE}/chat/completions"
+SUMMARY_MODEL = "mistralai/Mixtral-8x7B-Instruct-v0.1"
+SUMMARY_PROMPT = (
+    "You are an assistant summarizing video transcripts. "
+    "Summarize the following transcript in 1-3 concise paragraphs. "
+    "Focus on key points, main arguments, and important details."
+)
+SUMMARY_MAX_TOKENS = 512
+
+# Transcripts longer than SUMMARY_CHUNK_TOKENS are summarized map-reduce style:
+# overlapping chunks are summarized concurrently, then merged.
+SUMMARY_CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", "6000"))
+SUMMARY_CHUNK_OVERLAP = int(os.environ.get("SUMMARY_CHUNK_OVERLAP", "200"))
+SUMMARY_CHUNK_MAX_TOKENS = int(os.environ.get("SUMMARY_CHUNK_MAX_TOKENS", "300"))
+SUMMARY_CONCURRENCY = int(os.environ.get("SUMMARY_CONCURRENCY", "4"))
+CHUNK_PROMPT = (
+    "You are an assistant summarizing one part of a longer video transcript. "
+    "Summarize this part in one short paragraph, keeping key points, names, "
+    "numbers and conclusions. Do not add an introduction."
+)
+REDUCE_PROMPT_SUFFIX = (
+    " The input consists of summaries of consecutive parts of the video; "
+    "merge them into one coherent summary without repeating yourself."
+)
+
+summary_flight = SingleFlight()
+
+
+class SummaryFailed(HTTPException):
+    """Every route failed to produce a summary; answered as 502."""
+
+    def __init__(self, detail: str = "Failed to get the summary."):
+        super().__init__(status_code=502, detail=detail)
+
+_compress = compression_enabled()
+router = ModelRouter(load_routes(SUMMARY_MODEL, SUMMARY_MAX_TOKENS, SUMMARY_CHUNK_TOKENS))
+
+
+def join_parts(summaries) -> str:
+    return "\n\n".join(f"Part {i}: {summary.strip()}" for i, summary in enumerate(summaries, 1))
+
+
+def summary_messages(transcript: str, prompt: str = SUMMARY_PROMPT) -> list[dict]:
+    return [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": f"Transcript: {transcript}"},
+    ]
+
+
+def routing_tokens(transcript: str) -> int:
+    tokens = estimate_tokens(transcript)
+    # compression runs before the model sees the text
+    return min(tokens, SUMMARY_COMPRESSION_TOKENS) if _compress else tokens
+
+
+def route_plan(transcript: str, model: str | None = None,
+               max_tokens: int | None = None) -> list[Route]:
+    """Routes to try in order: the routed tier and its fallbacks, or just ``model``."""
+    if model is not None:
+        return [Route("fixed", model, None, max_tokens or SUMMARY_MAX_TOKENS,
+                      SUMMARY_CHUNK_TOKENS, None)]
+    plan = router.plan(routing_tokens(transcript))
+    if max_tokens is not None:
+        plan = [route._replace(max_tokens=max_tokens) for route in plan]
+    return plan
+
+
+async def summarize_video(transcript: str, model: str | None = None,
+                          prompt: str = SUMMARY_PROMPT,
+                          max_tokens: int | None = None) -> str:
+    """Generate summary using Together AI chat completions API.
+
+    Without an explicit ``model`` the transcript is routed by its size to a
+    model tier and output budget (model_router), falling back to the next
+    tier on timeouts and 429s. Finished summaries are cached and identical
+    concurrent calls share a single upstream request, which needs an LLM
+    admission slot (raises ``Overloaded`` when shed). Raises ``SummaryFailed``
+    when no route produced a summary.
+    """
+    plan = route_plan(transcript, model, max_tokens)
+    key = SummaryCache.key(transcript, plan[0].model, prompt, plan[0].max_tokens)
+    cached = summary_cache.get(key)
+    cache_lookup("summary", cached is not None)
+    if cached is not None:
+        return cached
+
+    async def admitted():
+        async with llm_gate.admit(plan[0].name, plan[0].timeout):
+            return await _request_summary(key, transcript, plan, prompt)
+
+    return await summary_flight.do(key, admitted)
+
+
+async def _complete_routed(transcript: str, plan: list[Route], prompt: str) -> str:
+    tokens = routing_tokens(transcript)
+    for i, route in enumerate(plan):
+        started = time.perf_counter()
+        try:
+            attempt = _complete(route, transcript, prompt)
+            summary = await (attempt if route.timeout is None
+                             else asyncio.wait_for(attempt, route.timeout))
+        except Exception as e:
+            fallback = i + 1 < len(plan) and router.should_fall_back(e)
+            router.observe(route, tokens, time.perf_counter() - started,
+                           "fallback" if fallback else "error")
+            if not fallback:
+                raise
+            print(f"[model_router] {route.name} ({route.model}) failed: {e!r}; trying {plan[i + 1].name}")
+            continue
+        router.observe(route, tokens, time.perf_counter() - started, "ok")
+        return summary
+
+
+async def _complete(route: Route, transcript: str, prompt: str) -> str:
+    messages = await build_summary_messages(transcript, route.model, prompt, route.chunk_tokens,
+                                            route.timeout)
+    return await chat_completion(route.model, messages, route.max_tokens, route.timeout)
 
-    body = {
-        "model": "mistralai/Mixtral-8x7B-Instruct-v0.1",
-        "messages": [
-            {
-                "role": "system",
-                "content": (
-                    "You are an assistant summarizing video transcripts. "
-                    "Summarize the following transcript in 1-3 concise paragraphs. "
-                    "Focus on key points, main arguments, and important details."
-                ),
-            },
-            {"role": "user", "content": f"Transcript: {transcript}"},
-        ],
-        "max_tokens": 512,
-    }
 
+async def _request_summary(key: str, transcript: str, plan: list[Route], prompt: str) -> str:
     try:
-        async with httpx.AsyncClient(timeout=httpx.Timeout(30.0)) as client:
-            response = await client.post(
-                "https://api.together.xyz/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {TOGETHER_AI_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json=body,
-            )
-        response.raise_for_status()
-        result = response.json()
-        return result["choices"][0]["message"]["content"]
+        summary = await _complete_routed(transcript, plan, prompt)
+        summary_cache.set(key, summary)
+        return summary
 
     except httpx.HTTPStatusError as http_err:
         print("HTTP error:", http_err)
         print("Response content:", http_err.response.text)
-        return f"HTTP error occurred: {http_err}"
+        raise SummaryFailed() from http_err
     except Exception as e:
         print("Unexpected error:", repr(e))
         traceback.print_exc()
-        return f"Error: {str(e) or 'Unknown error occurred'}"
+        raise SummaryFailed() from e
+
+
+async def stream_summary(transcript: str, model: str | None = None,
+                         prompt: str = SUMMARY_PROMPT,
+                         max_tokens: int | None = None):
+    """Yield the summary as text deltas while Together AI generates it.
+
+    Uses the same routes, prompts (and map step for long transcripts) as
+    summarize_video, and stores the finished text in the summary cache. A
+    route only falls back before its first token; when the last one fails
+    ``SummaryFailed`` is raised. Closing the generator closes the upstream
+    response.
+    """
+    plan = route_plan(transcript, model, max_tokens)
+    key = SummaryCache.key(transcript, plan[0].model, prompt, plan[0].max_tokens)
+    cached = summary_cache.get(key)
+    cache_lookup("summary", cached is not None)
+    if cached is not None:
+        yield cached
+        return
+
+    tokens = routing_tokens(transcript)
+    async with llm_gate.admit(plan[0].name, plan[0].timeout):
+        for i, route in enumerate(plan):
+            started = time.perf_counter()
+            parts = []
+            try:
+                messages = await build_summary_messages(transcript, route.model, prompt,
+                                                        route.chunk_tokens, route.timeout)
+                async for delta in chat_completion_stream(route.model, messages, route.max_tokens,
+                                                          route.timeout):
+                    parts.append(delta)
+                    yield delta
+            except Exception as e:
+                fallback = not parts and i + 1 < len(plan) and router.should_fall_back(e)
+                router.observe(route, tokens, time.perf_counter() - started,
+                               "fallback" if fallback else "error")
+                if not fallback:
+                    print("Streaming summary failed:", repr(e))
+                    raise SummaryFailed() from e
+                print(f"[model_router] {route.name} ({route.model}) failed: {e!r}; trying {plan[i + 1].name}")
+                continue
+            router.observe(route, tokens, time.perf_counter() - started, "ok")
+            break
+    summary_cache.set(key, "".join(parts))
+
+
+async def build_summary_messages(transcript: str, model: str = SUMMARY_MODEL,
+                                 prompt: str = SUMMARY_PROMPT,
+                                 chunk_tokens: int = SUMMARY_CHUNK_TOKENS,
+                                 timeout: float | None = None) -> list[dict]:
+    """Messages for the final summary call.
+
+    With SUMMARY_COMPRESSION=1 the transcript is first cut down to its most
+    central sentences. Transcripts longer than ``chunk_tokens`` then go
+    through a concurrent map step (each call limited to ``timeout``) and the
+    final call only sees the merged chunk summaries.
+    """
+    if _compress:
+        transcript = await compress_for_summary(transcript)
+    if estimate_tokens(transcript) <= chunk_tokens:
+        return summary_messages(transcript, prompt)
+
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+    async def summarize_chunk(chunk: str) -> str:
+        async with semaphore:
+            return await chat_completion(
+                model, summary_messages(chunk, CHUNK_PROMPT), SUMMARY_CHUNK_MAX_TOKENS, timeout
+            )
+
+    text = transcript
+    # Summaries of a very long video can themselves overflow one prompt, so
+    # keep folding until the merged text fits.
+    while estimate_tokens(text) > chunk_tokens:
+        chunks = chunk_transcript(text, chunk_tokens, SUMMARY_CHUNK_OVERLAP)
+        print(f"[summarize_video] map step over {len(chunks)} chunks")
+        partials = await asyncio.gather(*(summarize_chunk(c) for c in chunks))
+        text = join_parts(partials)
+    return summary_messages(text, prompt + REDUCE_PROMPT_SUFFIX)
+
+
+async def chat_completion(model: str, messages: list[dict], max_tokens: int,
+                          timeout: float | None = None) -> str:
+    """POST one chat completion to Together AI; raises on HTTP errors.
+
+    ``timeout`` (seconds) replaces the shared client's HTTP_TIMEOUT, so a
+    route's own limit is what ends a slow long-context call.
+    """
+    TOGETHER_AI_API_KEY = os.environ["TOGETHER_AI_API_KEY"]
+
+    body = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+    }
+
+    with stage("llm", provider=model):
+        response = await get_async_client().post(
+            TOGETHER_CHAT_URL,
+            headers={
+                "Authorization": f"Bearer {TOGETHER_AI_API_KEY}",
+                "Content-Type": "application/json",
+            },
+            json=body,
+            timeout=httpx.USE_CLIENT_DEFAULT if timeout is None else timeout,
+        )
+    response.raise_for_status()
+    result = response.json()
+    return result["choices"][0]["message"]["content"]
+
+
+async def chat_completion_stream(model: str, messages: list[dict], max_tokens: int,
+                                 timeout: float | None = None):
+    """Stream one chat completion from Together AI, yielding content deltas."""
+    TOGETHER_AI_API_KEY = os.environ["TOGETHER_AI_API_KEY"]
+
+    body = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "stream": True,
+    }
+
+    with stage("llm_stream", provider=model):
+        async with get_async_client().stream(
+            "POST",
+            TOGETHER_CHAT_URL,
+            headers={
+                "Authorization": f"Bearer {TOGETHER_AI_API_KEY}",
+                "Content-Type": "application/json",
+            },
+            json=body,
+            timeout=httpx.USE_CLIENT_DEFAULT if timeout is None else timeout,
+        ) as response:
+            if response.is_error:
+                await response.aread()
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                if delta:
+                    yield delta
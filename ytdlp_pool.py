@@ -0,0 +1,198 @@
+import copy
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from upstream_guard import youtube
+
+# Reusable YoutubeDL instances per option profile. An instance keeps its
+# initialized extractors (and their player/signature caches) between calls;
+# it is used by one thread at a time. yt_dlp itself is imported on first
+# use, so registering a profile costs nothing at startup.
+YTDLP_POOL_SIZE = int(os.environ.get("YTDLP_POOL_SIZE", os.environ.get("TRANSCRIPT_WORKERS", "8")))
+# Resolved info dicts are reused for this long, so a retry or a fallback
+# provider does not resolve the same video again. Caption URLs stay valid
+# for hours; keep this well below that.
+YTDLP_INFO_TTL = float(os.environ.get("YTDLP_INFO_TTL", "300"))
+YTDLP_INFO_CACHE_SIZE = int(os.environ.get("YTDLP_INFO_CACHE_SIZE", "256"))
+
+
+class YtdlpPool:
+    """Bounded pool of YoutubeDL instances built from one options dict."""
+
+    def __init__(self, opts: dict, size: int = YTDLP_POOL_SIZE):
+        self.opts = opts
+        self.size = size
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new(self):
+        import yt_dlp
+
+        ydl = yt_dlp.YoutubeDL(dict(self.opts))
+        # initializing the extractors is the expensive part; do it up front
+        ydl.get_info_extractor("Youtube")
+        return ydl
+
+    def warm(self, count: int = 1) -> None:
+        for _ in range(count):
+            with self._lock:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            self._idle.put(self._new())
+
+    @contextmanager
+    def borrow(self):
+        try:
+            ydl = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._created < self.size
+                if grow:
+                    self._created += 1
+            if grow:
+                try:
+                    ydl = self._new()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                ydl = self._idle.get()
+        try:
+            yield ydl
+        finally:
+            self._idle.put(ydl)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class InfoCache:
+    """Short-TTL cache of extractor results keyed by video, resolved once per key.
+
+    Concurrent misses for one key wait for the first resolution instead of
+    resolving again. Values are JSON-safe (``YoutubeDL.sanitize_info``) and
+    callers get a deep copy, since processing mutates the dict.
+    """
+
+    def __init__(self, ttl: float = YTDLP_INFO_TTL, max_entries: int = YTDLP_INFO_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, info = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return info
+
+    def get_or_resolve(self, key: str, resolve) -> dict:
+        info = self._get(key)
+        if info is None:
+            with self._lock:
+                key_lock = self._key_locks.setdefault(key, threading.Lock())
+            with key_lock:
+                info = self._get(key)
+                if info is None:
+                    import yt_dlp
+
+                    try:
+                        info = yt_dlp.YoutubeDL.sanitize_info(resolve())
+                    finally:
+                        with self._lock:
+                            self._key_locks.pop(key, None)
+                    with self._lock:
+                        self.misses += 1
+                        self._entries[key] = (time.monotonic() + self.ttl, info)
+                        self._entries.move_to_end(key)
+                        while len(self._entries) > self.max_entries:
+                            self._entries.popitem(last=False)
+                    return copy.deepcopy(info)
+        with self._lock:
+            self.hits += 1
+        return copy.deepcopy(info)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+info_cache = InfoCache()
+POOLS: dict[str, YtdlpPool] = {}
+
+
+def register_profile(name: str, opts: dict) -> YtdlpPool:
+    POOLS[name] = YtdlpPool(opts)
+    return POOLS[name]
+
+
+def raw_info(ydl, url: str, key: str | None = None) -> dict:
+    """The unprocessed extractor result for ``url``, from the info cache when fresh."""
+    def resolve():
+        with youtube.guard():
+            return ydl.extract_info(url, download=False, process=False)
+
+    return info_cache.get_or_resolve(key or url, resolve)
+
+
+def borrow(profile: str):
+    """Context manager lending a pooled YoutubeDL for ``profile``."""
+    return POOLS[profile].borrow()
+
+
+def resolve(ydl, url: str, key: str | None = None) -> dict:
+    """Processed info dict for ``url`` (no download).
+
+    The video is resolved at most once per YTDLP_INFO_TTL across all
+    profiles; each profile only re-runs yt-dlp's local processing (format and
+    subtitle selection) on a copy of the cached result. Profiles must
+    therefore not differ in options that change extraction itself
+    (extractor_args, cookies).
+    """
+    return ydl.process_ie_result(raw_info(ydl, url, key), download=False)
+
+
+def warm_pools(names=None) -> None:
+    """Create one instance per profile (or per profile in ``names``) ahead of the first request."""
+    for name, pool in POOLS.items():
+        if names is None or name in names:
+            pool.warm()
+
+
+def close_pools() -> None:
+    for pool in POOLS.values():
+        pool.close()
+
+
+def ytdlp_stats() -> dict:
+    return {
+        "info_cache": info_cache.stats(),
+        "pools": {name: {"size": pool.size, "created": pool._created,
+                         "idle": pool._idle.qsize()} for name, pool in POOLS.items()},
+    }